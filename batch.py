@@ -0,0 +1,140 @@
+#! /usr/bin/env python
+import argparse
+import math
+import signal
+import sys
+import time
+
+import clashscore
+import inf
+import lddt
+import mcq
+import rmsd
+import tm_score
+from results import ERROR_FAILED, ERROR_NAN, ERROR_OK, ResultSink
+
+
+def score_clashscore(reference_pdb, model_pdb):
+    """Clashscore depends on the model only."""
+    return clashscore.calculate_clashscore(model_pdb)
+
+
+METRICS = {
+    "rmsd": rmsd.score_files,
+    "mcq": mcq.score_files,
+    "inf": lambda ref, model: inf.score_files(ref, model, "all"),
+    "inf_canonical": lambda ref, model: inf.score_files(ref, model, "canonical"),
+    "inf_non_canonical": lambda ref, model: inf.score_files(
+        ref, model, "non-canonical"
+    ),
+    "inf_stacking": lambda ref, model: inf.score_files(ref, model, "stacking"),
+    "lddt": lddt.score_files,
+    "tm_score": tm_score.calculate_tm_score,
+    "clashscore": score_clashscore,
+}
+
+DEFAULT_METRICS = ["rmsd", "mcq", "inf", "lddt", "tm_score"]
+
+
+def evaluate(function, reference, model, description):
+    """
+    Run a metric function and time it.
+
+    :param description: Text identifying the calculation in error messages
+    :return: Tuple of (value, elapsed seconds, error code)
+    """
+    start = time.perf_counter()
+    try:
+        value = function(reference, model)
+    except Exception as e:
+        print(f"Error calculating {description}: {e}", file=sys.stderr)
+        return math.nan, time.perf_counter() - start, ERROR_FAILED
+    elapsed = time.perf_counter() - start
+
+    if value is None or math.isnan(value):
+        return math.nan, elapsed, ERROR_NAN
+    return float(value), elapsed, ERROR_OK
+
+
+def run_metric(metric, reference_pdb, model_pdb):
+    """
+    Run a single metric and time it.
+
+    :return: Tuple of (value, elapsed seconds, error code)
+    """
+    return evaluate(
+        METRICS[metric], reference_pdb, model_pdb, f"{metric} for {model_pdb}"
+    )
+
+
+def score_pairs(pairs, metrics, sink):
+    """
+    Score (reference, model) pairs with all metrics and write rows to the sink.
+
+    :param pairs: Iterable of (reference_pdb, model_pdb) tuples
+    :param metrics: List of metric names from METRICS
+    :param sink: ResultSink receiving one row per pair and metric
+    """
+    for reference_pdb, model_pdb in pairs:
+        for metric in metrics:
+            value, elapsed, error = run_metric(metric, reference_pdb, model_pdb)
+            sink.append(reference_pdb, model_pdb, metric, value, elapsed, error)
+
+
+def read_pairs(pairs_file):
+    """Read whitespace-separated reference and model paths, one pair per line."""
+    with open(pairs_file) as f:
+        return [tuple(line.split()) for line in f if line.strip()]
+
+
+def raise_keyboard_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Score many models and store results in a columnar result directory."
+    )
+    parser.add_argument(
+        "--output", "-o", required=True, help="Output directory for result row groups"
+    )
+    parser.add_argument(
+        "--metrics",
+        "-m",
+        default=",".join(DEFAULT_METRICS),
+        help=f"Comma-separated metrics (available: {', '.join(METRICS)})",
+    )
+    parser.add_argument(
+        "--row-group-size",
+        type=int,
+        default=4096,
+        help="Number of rows buffered before writing (default: 4096)",
+    )
+    parser.add_argument(
+        "--pairs", help="File with 'reference model' pairs, one per line"
+    )
+    parser.add_argument("reference", nargs="?", help="Reference PDB file")
+    parser.add_argument("models", nargs="*", help="Model PDB files")
+    args = parser.parse_args()
+
+    metrics = args.metrics.split(",")
+    for metric in metrics:
+        if metric not in METRICS:
+            parser.error(f"unknown metric: {metric}")
+
+    if args.pairs:
+        pairs = read_pairs(args.pairs)
+    elif args.reference and args.models:
+        pairs = [(args.reference, model) for model in args.models]
+    else:
+        parser.error("either --pairs or reference and models are required")
+
+    # Make SIGTERM unwind like Ctrl+C, so that buffered rows get flushed
+    signal.signal(signal.SIGTERM, raise_keyboard_interrupt)
+
+    with ResultSink(args.output, args.row_group_size) as sink:
+        score_pairs(pairs, metrics, sink)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#! /usr/bin/env python
+import argparse
+import math
+import signal
+import sys
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from Bio import PDB
+
+from batch import METRICS, raise_keyboard_interrupt, run_metric
+from mcq import MCQ_COLUMNS, align_torsion_table, calculate_mcq_array
+from results import ERROR_FAILED, ERROR_NAN, ERROR_OK, ResultSink
+from rmsd import calculate_rmsd_batch, extract_phosphorus_coords
+from torsion import calculate_torsion_table
+from window import positive_int
+
+
+@dataclass(frozen=True)
+class CascadeConfig:
+    """
+    Filters applied after the cheap stage and metrics of the expensive stage.
+
+    Models are first filtered by thresholds (max_rmsd, max_mcq), then ranked
+    by rank_by and the best keep_top models or keep_fraction of models kept.
+    """
+
+    metrics: tuple = ("lddt", "inf", "tm_score")
+    max_rmsd: Optional[float] = None
+    max_mcq: Optional[float] = None
+    rank_by: str = "rmsd"
+    keep_top: Optional[int] = None
+    keep_fraction: Optional[float] = None
+
+    def __post_init__(self):
+        if self.keep_top is not None and self.keep_top < 1:
+            raise ValueError("keep_top must be positive")
+        if self.keep_fraction is not None and not 0 < self.keep_fraction <= 1:
+            raise ValueError("keep_fraction must be in (0, 1]")
+
+
+def load_cheap_features(pdb_file):
+    """Parse a structure once and gather phosphorus coordinates and torsions."""
+    parser = PDB.PDBParser(QUIET=True)
+    structure = parser.get_structure("struct", pdb_file)
+    index, angles = calculate_torsion_table(structure)
+    return extract_phosphorus_coords(structure), index, angles[:, MCQ_COLUMNS]
+
+
+def score_cheap(reference_pdb, model_pdbs, chunk_size=256):
+    """
+    Calculate P-atom RMSD and MCQ of models in vectorized form, chunk by chunk.
+
+    Models are loaded chunk_size at a time and only their scores are kept, so
+    memory use does not grow with the number of models.
+
+    :return: Tuple of (rmsd, mcq, elapsed, failed) arrays with one value per
+        model, NaN RMSD for models with a different number of phosphorus atoms
+        and failed set for models which could not be loaded
+    """
+    if chunk_size < 1:
+        raise ValueError("Chunk size must be positive")
+
+    ref_coords, ref_index, ref_angles = load_cheap_features(reference_pdb)
+
+    # Residues without any angle (water, ions) would only take space in chunks
+    nucleotide = ~np.isnan(ref_angles).all(axis=1)
+    ref_index, ref_angles = ref_index[nucleotide], ref_angles[nucleotide]
+
+    rmsd = np.full(len(model_pdbs), np.nan)
+    mcq = np.full(len(model_pdbs), np.nan)
+    elapsed = np.zeros(len(model_pdbs))
+    failed = np.zeros(len(model_pdbs), dtype=bool)
+
+    for chunk_start in range(0, len(model_pdbs), chunk_size):
+        chunk = slice(chunk_start, chunk_start + chunk_size)
+        chunk_pdbs = model_pdbs[chunk]
+
+        coords = np.full((len(chunk_pdbs), len(ref_coords), 3), np.nan)
+        angles = np.full((len(chunk_pdbs), *ref_angles.shape), np.nan)
+        matching = np.zeros(len(chunk_pdbs), dtype=bool)
+
+        for k, model_pdb in enumerate(chunk_pdbs):
+            start = time.perf_counter()
+            try:
+                model_coords, index, model_angles = load_cheap_features(model_pdb)
+            except Exception as e:
+                print(f"Error loading {model_pdb}: {e}", file=sys.stderr)
+                failed[chunk_start + k] = True
+            else:
+                if len(model_coords) == len(ref_coords):
+                    coords[k] = model_coords
+                    matching[k] = True
+                angles[k] = align_torsion_table(ref_index, index, model_angles)
+            elapsed[chunk_start + k] = time.perf_counter() - start
+
+        # Batched calculation, its time is shared equally between models
+        start = time.perf_counter()
+        chunk_rmsd = np.full(len(chunk_pdbs), np.nan)
+        if np.any(matching):
+            chunk_rmsd[matching] = calculate_rmsd_batch(ref_coords, coords[matching])
+        rmsd[chunk] = chunk_rmsd
+        mcq[chunk] = calculate_mcq_array(ref_angles, angles)
+        elapsed[chunk] += (time.perf_counter() - start) / len(chunk_pdbs)
+
+    return rmsd, mcq, elapsed, failed
+
+
+def select_survivors(rmsd, mcq, config):
+    """
+    Apply threshold and rank filters to the results of the cheap stage.
+
+    :return: Array of indices of models passed to the expensive stage
+    """
+    scores = {"rmsd": rmsd, "mcq": mcq}
+    passed = ~np.isnan(scores[config.rank_by])
+    if config.max_rmsd is not None:
+        passed &= rmsd <= config.max_rmsd
+    if config.max_mcq is not None:
+        passed &= mcq <= config.max_mcq
+
+    candidates = np.flatnonzero(passed)
+    candidates = candidates[
+        np.argsort(scores[config.rank_by][candidates], kind="stable")
+    ]
+
+    keep = len(candidates)
+    if config.keep_fraction is not None:
+        keep = min(keep, math.ceil(config.keep_fraction * len(rmsd)))
+    if config.keep_top is not None:
+        keep = min(keep, config.keep_top)
+    return candidates[:keep]
+
+
+def run_cascade(reference_pdb, model_pdbs, config, sink, chunk_size=256):
+    """
+    Score models with cheap metrics first and expensive ones only for survivors.
+
+    :param reference_pdb: Path to reference PDB file
+    :param model_pdbs: List of paths to model PDB files
+    :param config: CascadeConfig with filters and expensive metrics
+    :param sink: ResultSink receiving one row per model and calculated metric
+    :param chunk_size: Number of models held in memory in the cheap stage
+    :return: List of (stage name, number of models, elapsed seconds) tuples
+    """
+    stages = []
+
+    start = time.perf_counter()
+    rmsd, mcq, elapsed, failed = score_cheap(reference_pdb, model_pdbs, chunk_size)
+    for k, model_pdb in enumerate(model_pdbs):
+        for metric, values in (("rmsd", rmsd), ("mcq", mcq)):
+            if failed[k]:
+                error = ERROR_FAILED
+            else:
+                error = ERROR_NAN if np.isnan(values[k]) else ERROR_OK
+            sink.append(reference_pdb, model_pdb, metric, values[k], elapsed[k], error)
+    stages.append(("rmsd, mcq", len(model_pdbs), time.perf_counter() - start))
+
+    start = time.perf_counter()
+    survivors = select_survivors(rmsd, mcq, config)
+    stages.append(("filter", len(survivors), time.perf_counter() - start))
+
+    start = time.perf_counter()
+    for k in survivors:
+        for metric in config.metrics:
+            value, metric_elapsed, error = run_metric(
+                metric, reference_pdb, model_pdbs[k]
+            )
+            sink.append(
+                reference_pdb, model_pdbs[k], metric, value, metric_elapsed, error
+            )
+    stages.append(
+        (", ".join(config.metrics), len(survivors), time.perf_counter() - start)
+    )
+
+    return stages
+
+
+def fraction(value):
+    """Parse a command line argument which must be a number in (0, 1]."""
+    number = float(value)
+    if not 0 < number <= 1:
+        raise argparse.ArgumentTypeError(f"must be in (0, 1], got {value}")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Score models with cheap metrics, then expensive ones for the best."
+    )
+    parser.add_argument(
+        "--output", "-o", required=True, help="Output directory for result row groups"
+    )
+    parser.add_argument(
+        "--metrics",
+        "-m",
+        default=",".join(CascadeConfig.metrics),
+        help=f"Comma-separated metrics for survivors (available: {', '.join(METRICS)})",
+    )
+    parser.add_argument("--max-rmsd", type=float, help="Keep models with lower RMSD")
+    parser.add_argument("--max-mcq", type=float, help="Keep models with lower MCQ")
+    parser.add_argument(
+        "--rank-by",
+        choices=["rmsd", "mcq"],
+        default="rmsd",
+        help="Metric used to rank models (default: rmsd)",
+    )
+    parser.add_argument(
+        "--keep-top", type=positive_int, help="Keep at most N best models"
+    )
+    parser.add_argument(
+        "--keep-fraction", type=fraction, help="Keep at most this fraction of models"
+    )
+    parser.add_argument(
+        "--row-group-size",
+        type=int,
+        default=4096,
+        help="Number of rows buffered before writing (default: 4096)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=positive_int,
+        default=256,
+        help="Number of models scored together in the cheap stage (default: 256)",
+    )
+    parser.add_argument("reference", help="Reference PDB file")
+    parser.add_argument("models", nargs="+", help="Model PDB files")
+    args = parser.parse_args()
+
+    metrics = tuple(args.metrics.split(","))
+    for metric in metrics:
+        if metric not in METRICS:
+            parser.error(f"unknown metric: {metric}")
+
+    config = CascadeConfig(
+        metrics=metrics,
+        max_rmsd=args.max_rmsd,
+        max_mcq=args.max_mcq,
+        rank_by=args.rank_by,
+        keep_top=args.keep_top,
+        keep_fraction=args.keep_fraction,
+    )
+
+    # Make SIGTERM unwind like Ctrl+C, so that buffered rows get flushed
+    signal.signal(signal.SIGTERM, raise_keyboard_interrupt)
+
+    with ResultSink(args.output, args.row_group_size) as sink:
+        stages = run_cascade(args.reference, args.models, config, sink, args.chunk_size)
+
+    for name, count, elapsed in stages:
+        print(f"{name}: {count} models, {elapsed:.2f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
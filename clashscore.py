@@ -7,10 +7,26 @@ import requests
 from bs4 import BeautifulSoup
 
 
-def calculate_clashscore(pdb_file):
-    """Calculate clashscore using MolProbity web service."""
-    base_url = "http://molprobity.biochem.duke.edu"
-    session = requests.Session()
+BASE_URL = "http://molprobity.biochem.duke.edu"
+
+
+def calculate_clashscore(pdb_file, session=None, base_url=BASE_URL):
+    """Calculate clashscore of a PDB file using MolProbity web service."""
+    with open(pdb_file, "rb") as f:
+        content = f.read()
+    return calculate_clashscore_content(content, Path(pdb_file).name, session, base_url)
+
+
+def calculate_clashscore_content(content, file_name, session=None, base_url=BASE_URL):
+    """
+    Calculate clashscore of a structure content using MolProbity web service.
+
+    Each call uses its own MolProbity session. If no requests session is given,
+    a new one is created and closed when done.
+    """
+    if session is None:
+        with requests.Session() as session:
+            return calculate_clashscore_content(content, file_name, session, base_url)
 
     # Step 1: Get the initial page and extract MolProbSID
     response = session.get(f"{base_url}/")
@@ -19,17 +35,16 @@ def calculate_clashscore(pdb_file):
     upload_event_id = soup.find("input", {"name": "eventID"})["value"]
 
     # Step 2: Upload the file
-    with open(pdb_file, "rb") as f:
-        upload_data = {
-            "MolProbSID": molprobsid,
-            "cmd": "Upload >",
-            "eventID": upload_event_id,
-            "fetchType": "pdb",
-            "pdbCode": "",
-            "uploadType": "pdb",
-        }
-        files = {"uploadFile": (Path(pdb_file).name, f)}
-        response = session.post(f"{base_url}/index.php", data=upload_data, files=files)
+    upload_data = {
+        "MolProbSID": molprobsid,
+        "cmd": "Upload >",
+        "eventID": upload_event_id,
+        "fetchType": "pdb",
+        "pdbCode": "",
+        "uploadType": "pdb",
+    }
+    files = {"uploadFile": (file_name, content)}
+    response = session.post(f"{base_url}/index.php", data=upload_data, files=files)
 
     # Step 3: Wait for processing and follow meta refreshes
     event_id = None
@@ -101,7 +116,7 @@ def calculate_clashscore(pdb_file):
     event_id = event_input["value"]
 
     # Step 6: Run the analysis with the new eventID
-    file_name = Path(pdb_file).stem  # Remove .pdb extension
+    model_id = Path(file_name).stem  # Remove .pdb extension
     analysis_data = {
         "MolProbSID": molprobsid,
         "chartAltloc": "1",
@@ -113,7 +128,7 @@ def calculate_clashscore(pdb_file):
         "kinBaseP": "1",
         "kinGeom": "1",
         "kinSuite": "1",
-        "modelID": file_name,
+        "modelID": model_id,
     }
     session.post(f"{base_url}/index.php", data=analysis_data)
 
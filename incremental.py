@@ -0,0 +1,218 @@
+import numpy as np
+
+from inf import (
+    base_geometry,
+    calculate_inf,
+    find_stacked_pairs,
+    gather_base_atom_indices,
+)
+from lddt import THRESHOLDS, PreparedReference, extract_atoms
+from mcq import MCQ_COLUMNS
+from torsion import gather_atom_indices, take_atom_coords, torsion_table_from_coords
+
+
+class IncrementalScorer:
+    """
+    Rescore successive versions of a model against a fixed reference.
+
+    The previous model coordinates and partial results are cached: per-pair
+    lDDT preservation flags with their counts, per-residue sums of sines and
+    cosines for MCQ, and base geometry with the set of stacked bases for INF
+    of stacking. When a new version arrives, only lDDT pairs touching moved
+    atoms, torsion angles of residues around moved atoms and stackings of
+    residues with moved base atoms (checked against their KD-tree neighbors)
+    are recalculated, and the global scores are updated from the partial
+    results.
+
+    INF of base pairs is not updated incrementally: rnapolis resolves
+    conflicts between hydrogen bonds of the whole structure at once (atoms
+    used by base-phosphate and base-ribose contacts, occupied edges), so a
+    base pair may change when atoms far from both of its residues move.
+
+    Models must contain the same atoms in the same order as the reference, as
+    required by calculate_lddt (e.g. structures unified with unify_contents).
+
+    :param reference_structure: PDB structure of the reference
+    :param tolerance: Atoms that moved by less than this (in Angstroms along
+        each axis) are considered unchanged
+    """
+
+    def __init__(self, reference_structure, tolerance=1e-3):
+        self.tolerance = tolerance
+        self.reference = PreparedReference(reference_structure)
+
+        # Pair indices touching each atom, stored as CSR-like offsets
+        atom_pairs = np.concatenate([self.reference.pairs_i, self.reference.pairs_j])
+        self.pairs_by_atom = np.argsort(atom_pairs, kind="stable") % len(
+            self.reference.distances
+        )
+        self.pairs_offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(atom_pairs, minlength=self.reference.n_atoms))]
+        )
+
+        ref_coords, _ = extract_atoms(reference_structure)
+        self.index, self.atom_indices, self.same_chain_prev = gather_atom_indices(
+            reference_structure
+        )
+        self.ref_angles = self.calculate_angles(ref_coords, slice(None))
+
+        # Residues owning each atom used for torsion angles
+        self.residue_of_atom = np.full(self.reference.n_atoms, -1)
+        rows, _ = np.nonzero(self.atom_indices >= 0)
+        self.residue_of_atom[self.atom_indices[self.atom_indices >= 0]] = rows
+
+        # Base atoms and residues owning them, for stacking
+        self.base_indices, self.plane_indices = gather_base_atom_indices(
+            reference_structure
+        )
+        self.residue_of_base_atom = np.full(self.reference.n_atoms, -1)
+        rows, _ = np.nonzero(self.base_indices >= 0)
+        self.residue_of_base_atom[self.base_indices[self.base_indices >= 0]] = rows
+        self.ref_stacked = find_stacked_pairs(
+            *base_geometry(ref_coords, self.base_indices, self.plane_indices)
+        )
+
+        self.model_coords = None
+
+    def calculate_angles(self, coords, rows):
+        """Calculate MCQ torsion angles for selected residues (rows)."""
+        rows = np.arange(len(self.index))[rows]
+
+        # Neighbors are needed as context for angles spanning two residues
+        context = np.unique(np.concatenate([rows - 1, rows, rows + 1]))
+        context = context[(context >= 0) & (context < len(self.index))]
+        same_chain_prev = self.same_chain_prev[context] & np.concatenate(
+            [[False], np.diff(context) == 1]
+        )
+
+        _, angles = torsion_table_from_coords(
+            self.index[context],
+            take_atom_coords(coords, self.atom_indices[context]),
+            same_chain_prev,
+        )
+        return angles[np.searchsorted(context, rows)][:, MCQ_COLUMNS]
+
+    def pairs_of_atoms(self, atoms):
+        """Find lDDT pairs with at least one of the given atoms."""
+        pairs = [
+            self.pairs_by_atom[self.pairs_offsets[atom] : self.pairs_offsets[atom + 1]]
+            for atom in atoms
+        ]
+        return np.unique(np.concatenate([np.empty(0, dtype=int), *pairs]))
+
+    def update_lddt(self, coords, pairs):
+        """Recalculate preservation flags of selected pairs and update counts."""
+        i, j = self.reference.pairs_i[pairs], self.reference.pairs_j[pairs]
+        model_distances = np.linalg.norm(coords[i] - coords[j], axis=1)
+        differences = np.abs(self.reference.distances[pairs] - model_distances)
+        preserved = differences[:, None] < np.array(THRESHOLDS)
+
+        self.preserved_counts += np.sum(preserved, axis=0) - np.sum(
+            self.preserved[pairs], axis=0
+        )
+        self.preserved[pairs] = preserved
+
+    def update_mcq(self, coords, rows):
+        """Recalculate angles of selected residues and their partial sums."""
+        angles = self.calculate_angles(coords, rows)
+        abs_diff = np.abs(np.radians(self.ref_angles[rows]) - np.radians(angles))
+        min_diff = np.minimum(abs_diff, 2 * np.pi - abs_diff)
+        valid = ~np.isnan(min_diff)
+        min_diff = np.where(valid, min_diff, 0)
+
+        self.residue_sin[rows] = np.sum(np.sin(min_diff) * valid, axis=1)
+        self.residue_cos[rows] = np.sum(np.cos(min_diff) * valid, axis=1)
+        self.residue_count[rows] = np.sum(valid, axis=1)
+
+    def update_stacking(self, coords, rows):
+        """Recalculate base geometry of selected residues and their stackings."""
+        self.centers[rows], self.normals[rows] = base_geometry(
+            coords, self.base_indices[rows], self.plane_indices[rows]
+        )
+        changed = set(rows.tolist())
+        self.stacked = {
+            pair
+            for pair in self.stacked
+            if pair[0] not in changed and pair[1] not in changed
+        }
+        self.stacked |= find_stacked_pairs(self.centers, self.normals, rows)
+
+    def scores(self):
+        """Global scores calculated from the cached partial results."""
+        lddt = np.mean(self.preserved_counts / len(self.reference.distances))
+        if np.sum(self.residue_count) == 0:
+            mcq = np.nan
+        else:
+            mcq = np.degrees(
+                np.arctan2(np.sum(self.residue_sin), np.sum(self.residue_cos))
+            )
+        inf_stacking = calculate_inf(self.ref_stacked, self.stacked)
+        return {"lddt": lddt, "mcq": mcq, "inf_stacking": inf_stacking}
+
+    def score(self, model_structure):
+        """
+        Score a new version of the model.
+
+        :param model_structure: PDB structure of the model
+        :return: Dictionary with lddt, mcq and inf_stacking scores
+        """
+        model_coords, _ = extract_atoms(model_structure)
+
+        if len(model_coords) != self.reference.n_atoms:
+            raise ValueError(
+                "Number of atoms in reference and model structures do not match"
+            )
+
+        return self.score_coords(model_coords)
+
+    def score_coords(self, model_coords):
+        """
+        Score a new version of the model given as coordinates.
+
+        :param model_coords: Array of shape (N, 3) ordered like reference atoms
+        :return: Dictionary with lddt, mcq and inf_stacking scores
+        """
+        if self.model_coords is None:
+            # Nothing cached yet, calculate everything
+            self.model_coords = np.array(model_coords)
+            n_residues = len(self.index)
+            self.preserved = np.zeros(
+                (len(self.reference.distances), len(THRESHOLDS)), dtype=bool
+            )
+            self.preserved_counts = np.zeros(len(THRESHOLDS), dtype=np.int64)
+            self.residue_sin = np.zeros(n_residues)
+            self.residue_cos = np.zeros(n_residues)
+            self.residue_count = np.zeros(n_residues, dtype=np.int64)
+
+            self.update_lddt(self.model_coords, slice(None))
+            self.update_mcq(self.model_coords, np.arange(n_residues))
+            self.centers, self.normals = base_geometry(
+                self.model_coords, self.base_indices, self.plane_indices
+            )
+            self.stacked = find_stacked_pairs(self.centers, self.normals)
+            return self.scores()
+
+        moved = np.flatnonzero(
+            np.any(np.abs(model_coords - self.model_coords) > self.tolerance, axis=1)
+        )
+
+        # Cached coordinates change only for moved atoms, so small moves below
+        # the tolerance cannot accumulate unnoticed
+        self.model_coords[moved] = model_coords[moved]
+
+        self.update_lddt(self.model_coords, self.pairs_of_atoms(moved))
+
+        # Angles of a residue depend on atoms of its neighbors too
+        residues = self.residue_of_atom[moved]
+        residues = residues[residues >= 0]
+        rows = np.unique(np.concatenate([residues - 1, residues, residues + 1]))
+        rows = rows[(rows >= 0) & (rows < len(self.index))]
+        if len(rows) > 0:
+            self.update_mcq(self.model_coords, rows)
+
+        bases = np.unique(self.residue_of_base_atom[moved])
+        bases = bases[bases >= 0]
+        if len(bases) > 0:
+            self.update_stacking(self.model_coords, bases)
+
+        return self.scores()
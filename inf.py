@@ -1,9 +1,26 @@
 #! /usr/bin/env python
+import io
 import sys
 
-from rnapolis.annotator import extract_base_interactions
-from rnapolis.common import LeontisWesthof
+import numpy as np
+from Bio.PDB import PDBIO
+from Bio.PDB.kdtrees import KDTree
+from rnapolis.annotator import (
+    STACKING_MAX_ANGLE_BETWEEN_NORMALS,
+    STACKING_MAX_ANGLE_BETWEEN_VECTOR_AND_NORMAL,
+    STACKING_MAX_DISTANCE,
+    find_pairs,
+    find_stackings,
+)
+from rnapolis.common import BaseInteractions, LeontisWesthof
 from rnapolis.parser import read_3d_structure
+from rnapolis.tertiary import BASE_ATOMS
+
+from torsion import take_atom_coords
+
+# Atoms defining base planes, the same as in Residue3D.base_normal_vector
+PURINE_PLANE_ATOMS = ["N9", "N7", "N3"]
+PYRIMIDINE_PLANE_ATOMS = ["N1", "C4", "O2"]
 
 
 def calculate_inf(interactions1, interactions2):
@@ -45,35 +62,233 @@ def extract_interactions(interactions):
     return canonical_pairs, non_canonical_pairs, stacking_pairs
 
 
-def process_structure(pdb_file):
+def annotate(structure, mode="all"):
+    """
+    Find base pairs and stackings needed for the given INF mode.
+
+    Base pairs or stackings are not searched at all when the mode does not
+    need them, and base-ribose or base-phosphate interactions are never kept.
+
+    :param structure: Structure3D from rnapolis
+    :param mode: One of canonical, non-canonical, stacking or all
+    :return: BaseInteractions with base pairs and stackings
+    """
+    base_pairs, stackings = [], []
+
+    if mode != "stacking":
+        base_pairs, _, _ = find_pairs(structure)
+
+    if mode not in ("canonical", "non-canonical"):
+        stackings = find_stackings(structure)
+
+    return BaseInteractions.from_structure3d(
+        structure, base_pairs, stackings, [], [], []
+    )
+
+
+def base_types(structure):
+    """
+    Find one-letter names of residues of a Biopython structure like rnapolis.
+
+    :return: Dictionary from (chain, number, insertion code) to one-letter name
+    """
+    buffer = io.StringIO()
+    pdbio = PDBIO()
+    pdbio.set_structure(structure)
+    pdbio.save(buffer)
+    buffer.seek(0)
+    return {
+        (residue.auth.chain, residue.auth.number, residue.auth.icode or " "): (
+            residue.one_letter_name
+        )
+        for residue in read_3d_structure(buffer).residues
+        if residue.auth is not None
+    }
+
+
+def gather_base_atom_indices(structure):
+    """
+    Find atoms used for stacking in all residues of a Biopython structure.
+
+    :return: Tuple of (base_indices, plane_indices), base_indices is an array
+        of shape (n_residues, max number of base atoms) with positions of base
+        atoms in structure.get_atoms() or -1 and plane_indices is an array of
+        shape (n_residues, 3) with positions of atoms defining the base plane
+        or -1 for missing atoms
+    """
+    one_letter_names = base_types(structure)
+    positions = {id(atom): k for k, atom in enumerate(structure.get_atoms())}
+    width = max(len(names) for names in BASE_ATOMS.values())
+    base_rows = []
+    plane_rows = []
+
+    for model in structure:
+        for chain in model:
+            for residue in chain:
+                key = (chain.id, residue.id[1], residue.id[2])
+                name = one_letter_names.get(key, "?")
+                if name in "AG":
+                    plane_atoms = PURINE_PLANE_ATOMS
+                else:
+                    plane_atoms = PYRIMIDINE_PLANE_ATOMS
+
+                row = [
+                    positions[id(residue[atom_name])] if atom_name in residue else -1
+                    for atom_name in BASE_ATOMS.get(name, [])
+                ]
+                base_rows.append(row + [-1] * (width - len(row)))
+                plane_rows.append(
+                    [
+                        positions[id(residue[atom_name])]
+                        if atom_name in residue
+                        else -1
+                        for atom_name in plane_atoms
+                    ]
+                )
+
+    return (
+        np.array(base_rows, dtype=int).reshape(-1, width),
+        np.array(plane_rows, dtype=int).reshape(-1, 3),
+    )
+
+
+def base_geometry(coords, base_indices, plane_indices):
+    """
+    Calculate geometric centers and unit normal vectors of bases.
+
+    :param coords: Array of shape (N, 3) with coordinates of all atoms
+    :return: Tuple of (centers, normals) arrays of shape (n_residues, 3) with
+        NaN for residues without base atoms or atoms defining the plane
+    """
+    present = base_indices >= 0
+    base_coords = take_atom_coords(coords, base_indices)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        centers = (
+            np.sum(np.where(present[..., None], base_coords, 0), axis=1)
+            / (np.sum(present, axis=1)[:, None])
+        )
+
+    plane = take_atom_coords(coords, plane_indices)
+    normals = np.cross(plane[:, 1] - plane[:, 0], plane[:, 2] - plane[:, 0])
+    normals /= np.linalg.norm(normals, axis=1)[:, None]
+    return centers, normals
+
+
+def find_stacked_pairs(centers, normals, residues=None):
+    """
+    Find stacked bases with the same criteria as rnapolis find_stackings.
+
+    :param centers: Array of shape (n_residues, 3) with centers of bases
+    :param normals: Array of shape (n_residues, 3) with unit normal vectors
+    :param residues: Optional indices of residues, if given only pairs with at
+        least one of them are checked
+    :return: Set of (i, j) tuples of residue indices with i < j
+    """
+    valid = np.flatnonzero(~np.isnan(centers).any(axis=1))
+    if len(valid) < 2:
+        return set()
+
+    # Neighbors are found with a margin, exact distances are checked below
+    radius = STACKING_MAX_DISTANCE + 1e-3
+    kdtree = KDTree(np.ascontiguousarray(centers[valid], dtype=np.float64), 10)
+    if residues is None:
+        pairs = [
+            (neighbor.index1, neighbor.index2)
+            for neighbor in kdtree.neighbor_search(radius)
+        ]
+    else:
+        position = {residue: k for k, residue in enumerate(valid)}
+        pairs = [
+            (position[residue], point.index)
+            for residue in residues
+            if residue in position
+            for point in kdtree.search(centers[residue], radius)
+            if point.index != position[residue]
+        ]
+    pairs = np.sort(valid[np.array(pairs, dtype=int).reshape(-1, 2)], axis=1)
+    i, j = pairs[:, 0], pairs[:, 1]
+
+    def angle(vectors1, vectors2):
+        cosine = np.sum(vectors1 * vectors2, axis=1) / (
+            np.linalg.norm(vectors1, axis=1) * np.linalg.norm(vectors2, axis=1)
+        )
+        return np.degrees(np.arccos(np.clip(cosine, -1, 1)))
+
+    vectors = centers[i] - centers[j]
+    normals_angle = np.minimum(
+        angle(normals[i], normals[j]), angle(-normals[i], normals[j])
+    )
+    vector_angle = np.minimum(angle(vectors, normals[i]), angle(vectors, normals[j]))
+    stacked = (
+        (np.linalg.norm(vectors, axis=1) <= STACKING_MAX_DISTANCE)
+        & (normals_angle <= STACKING_MAX_ANGLE_BETWEEN_NORMALS)
+        & (vector_angle <= STACKING_MAX_ANGLE_BETWEEN_VECTOR_AND_NORMAL)
+    )
+    return set(map(tuple, pairs[stacked].tolist()))
+
+
+def process_structure(pdb_file, mode="all"):
     """Process PDB file to extract different types of interactions."""
     with open(pdb_file) as f:
-        structure = read_3d_structure(f)
-        interactions = extract_base_interactions(structure)
-        return extract_interactions(interactions)
+        return process_content(f.read(), mode)
 
 
-def main(pdb_file1, pdb_file2, mode="all"):
-    canonical1, non_canonical1, stacking1 = process_structure(pdb_file1)
-    canonical2, non_canonical2, stacking2 = process_structure(pdb_file2)
+def process_content(content, mode="all"):
+    """
+    Process PDB or mmCIF content to extract different types of interactions.
+
+    Interactions not needed for the given mode are not searched and returned
+    as empty lists.
+    """
+    structure = read_3d_structure(io.StringIO(content))
+    return find_interactions(structure, mode)
+
 
-    # Calculate INF scores for each interaction type
-    canonical_inf = calculate_inf(canonical1, canonical2)
-    non_canonical_inf = calculate_inf(non_canonical1, non_canonical2)
-    stacking_inf = calculate_inf(stacking1, stacking2)
-    all_interactions1 = canonical1 + non_canonical1 + stacking1
-    all_interactions2 = canonical2 + non_canonical2 + stacking2
-    all_inf = calculate_inf(all_interactions1, all_interactions2)
+def find_interactions(structure, mode="all"):
+    """Extract different types of interactions needed for the mode from Structure3D."""
+    return extract_interactions(annotate(structure, mode))
+
+
+def score_files(pdb_file1, pdb_file2, mode="all"):
+    """Calculate INF score between two PDB files for the given interaction mode."""
+    with open(pdb_file1) as f:
+        with open(pdb_file2) as g:
+            return score_contents(f.read(), g.read(), mode)
+
+
+def score_contents(content1, content2, mode="all"):
+    """Calculate INF score between two structure contents for the given mode."""
+    return score_interactions(
+        process_content(content1, mode), process_content(content2, mode), mode
+    )
+
+
+def score_interactions(interactions1, interactions2, mode="all"):
+    """
+    Calculate INF score between interactions extracted from two structures.
+
+    :param interactions1: Tuple of (canonical, non-canonical, stacking) lists
+        as returned by extract_interactions
+    :param interactions2: Tuple of the same kind for the other structure
+    """
+    canonical1, non_canonical1, stacking1 = interactions1
+    canonical2, non_canonical2, stacking2 = interactions2
 
     # Return score based on mode
     if mode == "canonical":
-        print(f"{canonical_inf:.4f}")
+        return calculate_inf(canonical1, canonical2)
     elif mode == "non-canonical":
-        print(f"{non_canonical_inf:.4f}")
+        return calculate_inf(non_canonical1, non_canonical2)
     elif mode == "stacking":
-        print(f"{stacking_inf:.4f}")
+        return calculate_inf(stacking1, stacking2)
     else:  # 'all' is default
-        print(f"{all_inf:.4f}")
+        all_interactions1 = canonical1 + non_canonical1 + stacking1
+        all_interactions2 = canonical2 + non_canonical2 + stacking2
+        return calculate_inf(all_interactions1, all_interactions2)
+
+
+def main(pdb_file1, pdb_file2, mode="all"):
+    print(f"{score_files(pdb_file1, pdb_file2, mode):.4f}")
 
 
 if __name__ == "__main__":
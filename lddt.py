@@ -1,109 +1,381 @@
 #! /usr/bin/env python
-import sys
-import tempfile
+import argparse
+import functools
+import io
 import os
 import shutil
-import subprocess
+import tempfile
 
 import numpy as np
+import pandas as pd
 from Bio.PDB import PDBParser
-from rnapolis.unifier import main as unifier_main
+from Bio.PDB.kdtrees import KDTree
+from rnapolis import unifier
+from rnapolis.parser import is_cif
+from rnapolis.parser_v2 import fit_to_pdb, parse_cif_atoms, parse_pdb_atoms, write_pdb
+from rnapolis.tertiary_v2 import Structure
+
+
+@functools.cache
+def load_components():
+    """Load standard nucleotide components used for unification (cached)."""
+    return unifier.load_components()
+
+
+def unify_residues(residues, components):
+    """Rename, filter and reorder atoms of nucleotides to standard components."""
+    result = []
+    for residue in residues:
+        if residue.residue_name not in "ACGU":
+            continue
+
+        component = components[residue.residue_name]
+        mapping_dict = dict(zip(component["alt_atom_id"], component["atom_id"]))
+        valid_names = component["atom_id"]
+        valid_names = valid_names[~valid_names.str.startswith("H")]
+        valid_order = {value: idx for idx, value in enumerate(valid_names.tolist())}
+        column = "name" if residue.format == "PDB" else "auth_atom_id"
+
+        # Replace alternative name with standard name
+        residue.atoms[column] = residue.atoms[column].replace(mapping_dict)
+        # Leave only standard, non-hydrogen atoms
+        residue.atoms = residue.atoms[residue.atoms[column].isin(valid_names)]
+        # Reorder atoms
+        residue.atoms = residue.atoms.sort_values(
+            by=[column], key=lambda col: col.map(valid_order)
+        )
+        result.append(residue)
+    return result
+
+
+def unify_contents(reference_content, model_content):
+    """
+    Unify content of two structures in memory.
+
+    Follows the rnapolis unifier: atoms are standardized, residues with
+    different atom counts are removed from both structures and residue
+    identifiers are taken from the reference.
+
+    :param reference_content: PDB or mmCIF content of the reference
+    :param model_content: PDB or mmCIF content of the model
+    :return: Tuple of (unified_reference, unified_model) PDB contents
+    :raises ValueError: If residue counts or names do not match
+    """
+    components = load_components()
+    structures = []
+
+    for content in (reference_content, model_content):
+        if is_cif(io.StringIO(content)):
+            atoms = parse_cif_atoms(content)
+        else:
+            atoms = parse_pdb_atoms(content)
+        structures.append(unify_residues(Structure(atoms).residues, components))
+
+    ref_residues, model_residues = structures
+
+    if len(ref_residues) != len(model_residues):
+        raise ValueError("Number of residues in reference and model do not match")
+
+    for residue, ref_residue in zip(model_residues, ref_residues):
+        if residue.residue_name != ref_residue.residue_name:
+            raise ValueError(
+                f"Residue {residue} in model does not match {ref_residue} in reference"
+            )
+
+    # Keep only residues with the same number of atoms
+    kept = [
+        i
+        for i, (residue, ref_residue) in enumerate(zip(model_residues, ref_residues))
+        if len(residue.atoms) == len(ref_residue.atoms)
+    ]
+    ref_residues = [ref_residues[i] for i in kept]
+    model_residues = [model_residues[i] for i in kept]
+
+    # With two structures a tie in residue identifiers is resolved to the reference
+    for residue, ref_residue in zip(model_residues, ref_residues):
+        residue.chain_id = ref_residue.chain_id
+        residue.residue_number = ref_residue.residue_number
+        residue.insertion_code = ref_residue.insertion_code
+
+    return tuple(
+        write_pdb(fit_to_pdb(pd.concat([residue.atoms for residue in residues])))
+        for residues in (ref_residues, model_residues)
+    )
 
 
 def unify_structures(reference_pdb, model_pdb):
     """
-    Unify two PDB structures using the rnapolis unifier.
+    Unify two PDB structures and write them into a new temporary directory.
 
     :param reference_pdb: Path to reference PDB file
     :param model_pdb: Path to model PDB file
     :return: Tuple of (unified_ref_path, unified_model_path, temp_dir)
     """
+    with open(reference_pdb) as f:
+        reference_content = f.read()
+    with open(model_pdb) as f:
+        model_content = f.read()
+
+    unified_ref_content, unified_model_content = unify_contents(
+        reference_content, model_content
+    )
+
+    # Reference and model go to separate subdirectories, so equal names do not clash
     temp_dir = tempfile.mkdtemp()
+    unified_ref = os.path.join(temp_dir, "reference", os.path.basename(reference_pdb))
+    unified_model = os.path.join(temp_dir, "model", os.path.basename(model_pdb))
 
-    # Save original sys.argv and replace it for unifier
-    original_argv = sys.argv
-    sys.argv = [
-        "unifier",
-        "--output",
-        temp_dir,
-        "--format",
-        "keep",
-        reference_pdb,
-        model_pdb,
-    ]
+    for path, content in (
+        (unified_ref, unified_ref_content),
+        (unified_model, unified_model_content),
+    ):
+        os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write(content)
 
-    try:
-        unifier_main()
-    except SystemExit:
-        # unifier_main() calls sys.exit(), catch it to continue
-        pass
-    finally:
-        # Restore original sys.argv
-        sys.argv = original_argv
+    return unified_ref, unified_model, temp_dir
 
-    # Get the unified file paths
-    ref_base = os.path.splitext(os.path.basename(reference_pdb))[0]
-    model_base = os.path.splitext(os.path.basename(model_pdb))[0]
-    ref_ext = os.path.splitext(reference_pdb)[1]
-    model_ext = os.path.splitext(model_pdb)[1]
 
-    unified_ref = os.path.join(temp_dir, f"{ref_base}{ref_ext}")
-    unified_model = os.path.join(temp_dir, f"{model_base}{model_ext}")
+INCLUSION_RADIUS = 5
+THRESHOLDS = [0.5, 1, 2, 4]
 
-    return unified_ref, unified_model, temp_dir
+
+def find_inclusion_pairs(coords, residue_index, radius=INCLUSION_RADIUS):
+    """
+    Find pairs of atoms from different residues within the inclusion radius.
+
+    :param coords: Array of shape (N, 3) with atom coordinates
+    :param residue_index: Array of shape (N,) with residue number of each atom
+    :param radius: Inclusion radius in Angstroms
+    :return: Tuple of (i, j, distances) arrays, each pair listed once
+    """
+    if len(coords) < 2:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0)
+
+    # Search slightly beyond the radius, the exact cutoff is applied below
+    kdtree = KDTree(np.asarray(coords, dtype=np.float64), 10)
+    neighbors = kdtree.neighbor_search(radius + 1e-3)
+    pairs = np.array(
+        [(neighbor.index1, neighbor.index2) for neighbor in neighbors], dtype=int
+    ).reshape(-1, 2)
+    i, j = pairs[:, 0], pairs[:, 1]
+
+    distances = np.linalg.norm(coords[i] - coords[j], axis=1)
+    mask = (distances <= radius) & (residue_index[i] != residue_index[j])
+    return i[mask], j[mask], distances[mask]
 
 
-def calculate_lddt(reference_structure, model_structure):
+def extract_atoms(structure):
+    """
+    Extract atom coordinates and residue membership.
+
+    :param structure: PDB structure
+    :return: Tuple of (coords, residue_index) arrays, atoms with equal
+        residue_index belong to residues with equal identifiers
+    """
+    atoms = list(structure.get_atoms())
+    coords = np.array([atom.coord for atom in atoms]).reshape(-1, 3)
+    residues = {}
+    residue_index = np.array(
+        [residues.setdefault(atom.parent.id, len(residues)) for atom in atoms],
+        dtype=int,
+    )
+    return coords, residue_index
+
+
+class PreparedReference:
+    """
+    Reference-dependent part of lDDT, computed once and reused for many models.
+
+    Holds the list of atom pairs included in the score (atoms from different
+    residues within the inclusion radius) together with their reference
+    distances, so scoring a model only needs distances for those pairs.
+
+    :param reference_structure: PDB structure of the reference
+    """
+
+    def __init__(self, reference_structure):
+        ref_coords, residue_index = extract_atoms(reference_structure)
+
+        self.n_atoms = len(ref_coords)
+        self.pairs_i, self.pairs_j, self.distances = find_inclusion_pairs(
+            ref_coords, residue_index
+        )
+
+    def score(self, model_structure):
+        """
+        Calculate lDDT of a model against the prepared reference.
+
+        :param model_structure: PDB structure of the model
+        :return: lDDT score (0-1, where 1 is perfect agreement)
+        """
+        model_coords = np.array([atom.coord for atom in model_structure.get_atoms()])
+
+        if len(model_coords) != self.n_atoms:
+            raise ValueError(
+                "Number of atoms in reference and model structures do not match"
+            )
+
+        return self.score_coords(model_coords)
+
+    def score_coords(self, model_coords):
+        """
+        Calculate lDDT for model coordinates ordered like the reference atoms.
+
+        :param model_coords: Array of shape (N, 3) or a stack of shape (M, N, 3)
+        :return: lDDT score, or an array of M scores for a stack of models
+        """
+        model_distances = np.linalg.norm(
+            model_coords[..., self.pairs_i, :] - model_coords[..., self.pairs_j, :],
+            axis=-1,
+        )
+        differences = np.abs(self.distances - model_distances)
+
+        scores = [
+            np.sum(differences < threshold, axis=-1) / len(self.distances)
+            for threshold in THRESHOLDS
+        ]
+        return np.mean(scores, axis=0)
+
+
+# Estimated bytes of temporary arrays per atom pair in a tile
+BYTES_PER_PAIR = 64
+
+
+def parse_memory(value):
+    """
+    Parse a memory size with an optional K, M or G suffix (powers of 1024).
+
+    :param value: Size such as "4096", "512M" or "2G"
+    :return: Size in bytes
+    """
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3}
+    value = value.strip().upper().removesuffix("B")
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def iterate_tiles(coords, max_memory, radius=INCLUSION_RADIUS):
+    """
+    Split atoms into spatial tiles that fit into a memory budget.
+
+    Atoms are assigned to cubic cells with an edge equal to the inclusion
+    radius, so all neighbors of an atom are within the 27 surrounding cells.
+    For each cell, rows (atoms of the cell) and columns (atoms of the
+    surrounding cells) are further split into chunks.
+
+    :param coords: Array of shape (N, 3) with atom coordinates
+    :param max_memory: Memory budget in bytes for a single tile
+    :param radius: Inclusion radius in Angstroms
+    :return: Generator of (rows, columns) arrays with atom indices
+    """
+    cells = np.floor((coords - coords.min(axis=0)) / radius).astype(int)
+    order = np.lexsort(cells.T[::-1])
+    keys, starts, counts = np.unique(
+        cells[order], axis=0, return_index=True, return_counts=True
+    )
+    ranges = {
+        tuple(key): (start, start + count)
+        for key, start, count in zip(keys.tolist(), starts, counts)
+    }
+    offsets = [(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1)]
+    max_pairs = max(1, max_memory // BYTES_PER_PAIR)
+
+    for key, (start, end) in ranges.items():
+        rows = order[start:end]
+        columns = np.concatenate(
+            [
+                order[slice(*ranges[neighbor])]
+                for neighbor in (
+                    (key[0] + dx, key[1] + dy, key[2] + dz) for dx, dy, dz in offsets
+                )
+                if neighbor in ranges
+            ]
+        )
+
+        column_chunk = min(len(columns), max_pairs)
+        row_chunk = max(1, max_pairs // column_chunk)
+        for i in range(0, len(rows), row_chunk):
+            for j in range(0, len(columns), column_chunk):
+                yield rows[i : i + row_chunk], columns[j : j + column_chunk]
+
+
+def calculate_lddt_chunked(ref_coords, model_coords, residue_index, max_memory):
+    """
+    Calculate lDDT tile by tile, keeping temporary arrays under a memory budget.
+
+    Counts of preserved and all included pairs are accumulated over tiles, so
+    the result is identical to the in-memory calculation.
+
+    :param ref_coords: Array of shape (N, 3) with reference coordinates
+    :param model_coords: Array of shape (N, 3) with model coordinates
+    :param residue_index: Array of shape (N,) with residue number of each atom
+    :param max_memory: Memory budget in bytes for a single tile
+    :return: lDDT score (0-1, where 1 is perfect agreement)
+    """
+    preserved = np.zeros(len(THRESHOLDS), dtype=np.int64)
+    total = 0
+
+    for rows, columns in iterate_tiles(ref_coords, max_memory):
+        ref_distances = np.linalg.norm(
+            ref_coords[rows, None] - ref_coords[None, columns], axis=2
+        )
+        # Include each pair once, from the tile containing its lower index
+        mask = (
+            (ref_distances <= INCLUSION_RADIUS)
+            & (rows[:, None] < columns[None, :])
+            & (residue_index[rows, None] != residue_index[None, columns])
+        )
+        model_distances = np.linalg.norm(
+            model_coords[rows, None] - model_coords[None, columns], axis=2
+        )
+        differences = np.abs(ref_distances[mask] - model_distances[mask])
+
+        for k, threshold in enumerate(THRESHOLDS):
+            preserved[k] += np.sum(differences < threshold)
+        total += len(differences)
+
+    return np.mean([count / total for count in preserved])
+
+
+def calculate_lddt(reference_structure, model_structure, max_memory=None):
     """
     Calculate the local Distance Difference Test (lDDT) score.
 
     :param reference_structure: PDB structure of the reference
     :param model_structure: PDB structure of the model
+    :param max_memory: Optional memory budget in bytes, if given the score is
+        calculated tile by tile instead of from a list of all pairs
     :return: lDDT score (0-1, where 1 is perfect agreement)
     """
-    ref_atoms = list(reference_structure.get_atoms())
-    model_atoms = list(model_structure.get_atoms())
+    if max_memory is None:
+        return PreparedReference(reference_structure).score(model_structure)
+
+    ref_coords, residue_index = extract_atoms(reference_structure)
+    model_coords, _ = extract_atoms(model_structure)
 
-    if len(ref_atoms) != len(model_atoms):
+    if len(ref_coords) != len(model_coords):
         raise ValueError(
             "Number of atoms in reference and model structures do not match"
         )
 
-    ref_coords = np.array([atom.coord for atom in ref_atoms])
-    model_coords = np.array([atom.coord for atom in model_atoms])
+    return calculate_lddt_chunked(ref_coords, model_coords, residue_index, max_memory)
 
-    # Calculate pairwise distances between all atoms efficiently
-    # This creates a 2D array where entry (i,j) is the distance between atom i and atom j
-    ref_distances = np.linalg.norm(ref_coords[:, None] - ref_coords, axis=2)
-    model_distances = np.linalg.norm(model_coords[:, None] - model_coords, axis=2)
 
-    # Create a mask for interactions: atoms within 5A and not on the diagonal (self-interaction)
-    interaction_mask = (ref_distances <= 5) & ~np.eye(len(ref_atoms), dtype=bool)
+def score_contents(reference_content, model_content, max_memory=None):
+    """Calculate lDDT between two structures given as PDB or mmCIF content."""
+    unified_ref, unified_model = unify_contents(reference_content, model_content)
 
-    # Exclude interactions between atoms in the same residue
-    for i, atom in enumerate(ref_atoms):
-        # Create a boolean array: True if atoms are in different residues, False otherwise
-        different_residue = ~np.array(
-            [atom.parent.id == ref_atoms[j].parent.id for j in range(len(ref_atoms))]
-        )
-        # Update the interaction mask to only include atoms in different residues
-        interaction_mask[i] &= different_residue
+    parser = PDBParser(QUIET=True)
+    reference_structure = parser.get_structure("reference", io.StringIO(unified_ref))
+    model_structure = parser.get_structure("model", io.StringIO(unified_model))
 
-    thresholds = [0.5, 1, 2, 4]
-    scores = []
-
-    for threshold in thresholds:
-        preserved_interactions = np.abs(ref_distances - model_distances) < threshold
-        score = np.sum(preserved_interactions[interaction_mask]) / np.sum(
-            interaction_mask
-        )
-        scores.append(score)
-
-    return np.mean(scores)
+    return calculate_lddt(reference_structure, model_structure, max_memory)
 
 
-def main(reference_pdb, model_pdb):
-    # Unify structures
+def score_files(reference_pdb, model_pdb, max_memory=None):
+    """Calculate lDDT between two PDB files after unifying their content."""
     unified_ref, unified_model, temp_dir = unify_structures(reference_pdb, model_pdb)
 
     try:
@@ -112,15 +384,24 @@ def main(reference_pdb, model_pdb):
         reference_structure = parser.get_structure("reference", unified_ref)
         model_structure = parser.get_structure("model", unified_model)
 
-        lddt_score = calculate_lddt(reference_structure, model_structure)
-        print(f"{lddt_score:.4f}")
+        return calculate_lddt(reference_structure, model_structure, max_memory)
     finally:
         # Clean up temporary directory
         shutil.rmtree(temp_dir)
 
 
+def main(reference_pdb, model_pdb, max_memory=None):
+    print(f"{score_files(reference_pdb, model_pdb, max_memory):.4f}")
+
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python lddt.py <reference_pdb> <model_pdb>")
-        sys.exit(1)
-    main(sys.argv[1], sys.argv[2])
+    parser = argparse.ArgumentParser(description="Calculate lDDT of a model.")
+    parser.add_argument("reference_pdb", help="Reference PDB file")
+    parser.add_argument("model_pdb", help="Model PDB file")
+    parser.add_argument(
+        "--max-memory",
+        type=parse_memory,
+        help="Memory budget for distance calculations, e.g. 512M or 2G",
+    )
+    args = parser.parse_args()
+    main(args.reference_pdb, args.model_pdb, args.max_memory)
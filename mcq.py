@@ -1,8 +1,14 @@
 #! /usr/bin/env python
+import io
+
 import numpy as np
 from Bio import PDB
 
-from torsion import calculate_torsion_angles
+from torsion import TABLE_ANGLES, calculate_torsion_angles
+
+# Columns of the torsion table compared by MCQ, the same as in calculate_mcq
+MCQ_ANGLES = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "chi"]
+MCQ_COLUMNS = [TABLE_ANGLES.index(name) for name in MCQ_ANGLES]
 
 
 def calculate_mcq(angles1, angles2):
@@ -43,20 +49,117 @@ def calculate_mcq(angles1, angles2):
     return mcq
 
 
-def main(pdb_file1, pdb_file2):
-    """Calculate MCQ between torsion angles of two structures."""
+def calculate_mcq_array(angles1, angles2):
+    """
+    Calculate MCQ between arrays of torsion angles.
+
+    Args:
+        angles1: Array of angles in degrees of shape (..., n_residues, n_angles),
+            NaN for missing values
+        angles2: Array of angles of the same shape, leading dimensions may be
+            used to calculate MCQ for many models at once
+
+    Returns:
+        Array of MCQ values in degrees, NaN where no angles could be compared
+    """
+    abs_diff = np.abs(np.radians(angles1) - np.radians(angles2))
+    min_diff = np.minimum(abs_diff, 2 * np.pi - abs_diff)
+    valid = ~np.isnan(min_diff)
+    min_diff = np.where(valid, min_diff, 0)
+
+    # Sums of sines and cosines over residues and angle types
+    sum_sin = np.sum(np.where(valid, np.sin(min_diff), 0), axis=(-2, -1))
+    sum_cos = np.sum(np.where(valid, np.cos(min_diff), 0), axis=(-2, -1))
+
+    mcq = np.degrees(np.arctan2(sum_sin, sum_cos))
+    return np.where(np.any(valid, axis=(-2, -1)), mcq, np.nan)
+
+
+def calculate_window_mcq(angles1, angles2, starts, ends):
+    """
+    Calculate MCQ for windows of consecutive residues.
+
+    Sums of sines and cosines of angular differences are accumulated per
+    residue into prefix sums, so each window costs O(1) regardless of width.
+
+    Args:
+        angles1: Array of angles in degrees of shape (n_residues, n_angles),
+            NaN for missing values
+        angles2: Array of angles of the same shape
+        starts: Array with the first residue of each window
+        ends: Array with the residue after the last one of each window
+
+    Returns:
+        Array of MCQ values in degrees for each window, NaN where no angles
+        could be compared
+    """
+    abs_diff = np.abs(np.radians(angles1) - np.radians(angles2))
+    min_diff = np.minimum(abs_diff, 2 * np.pi - abs_diff)
+    valid = ~np.isnan(min_diff)
+    min_diff = np.where(valid, min_diff, 0)
+
+    # Prefix sums over residues of per-residue sums over angle types
+    zero = np.zeros(1)
+    sum_sin = np.concatenate(
+        [zero, np.cumsum(np.sum(np.sin(min_diff) * valid, axis=1))]
+    )
+    sum_cos = np.concatenate(
+        [zero, np.cumsum(np.sum(np.cos(min_diff) * valid, axis=1))]
+    )
+    count = np.concatenate([zero, np.cumsum(np.sum(valid, axis=1))])
+
+    mcq = np.degrees(
+        np.arctan2(sum_sin[ends] - sum_sin[starts], sum_cos[ends] - sum_cos[starts])
+    )
+    return np.where(count[ends] - count[starts] > 0, mcq, np.nan)
+
+
+def align_torsion_table(reference_index, index, angles):
+    """
+    Reorder rows of a torsion table to match residues of a reference.
+
+    Works for any per-residue array, e.g. coordinates of shape (n_residues, 3).
+
+    Returns:
+        Array of shape (len(reference_index), n_angles), NaN for residues not
+        present in the table
+    """
+    fields = ["chain", "number", "icode"]
+    rows = {key: k for k, key in enumerate(index[fields].tolist())}
+
+    aligned = np.full((len(reference_index), *angles.shape[1:]), np.nan)
+    for k, key in enumerate(reference_index[fields].tolist()):
+        if key in rows:
+            aligned[k] = angles[rows[key]]
+    return aligned
+
+
+def score_files(pdb_file1, pdb_file2):
+    """Calculate MCQ between torsion angles of two PDB files."""
+    with open(pdb_file1) as f:
+        with open(pdb_file2) as g:
+            return score_contents(f.read(), g.read())
+
+
+def score_contents(content1, content2):
+    """Calculate MCQ between torsion angles of two PDB contents."""
     parser = PDB.PDBParser(QUIET=True)
 
     # Load structures
-    structure1 = parser.get_structure("struct1", pdb_file1)
-    structure2 = parser.get_structure("struct2", pdb_file2)
+    structure1 = parser.get_structure("struct1", io.StringIO(content1))
+    structure2 = parser.get_structure("struct2", io.StringIO(content2))
 
     # Calculate torsion angles
     angles1 = calculate_torsion_angles(structure1)
     angles2 = calculate_torsion_angles(structure2)
 
     # Calculate MCQ
-    mcq = calculate_mcq(angles1, angles2)
+    return calculate_mcq(angles1, angles2)
+
+
+def main(pdb_file1, pdb_file2):
+    """Calculate MCQ between torsion angles of two structures."""
+    mcq = score_files(pdb_file1, pdb_file2)
 
     if mcq is not None:
         print(f"{mcq:.4f}")
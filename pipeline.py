@@ -0,0 +1,381 @@
+#! /usr/bin/env python
+import argparse
+import functools
+import glob
+import gzip
+import io
+import math
+import os
+import queue
+import signal
+import sys
+import tarfile
+import threading
+
+from Bio import PDB
+from rnapolis.parser import read_3d_structure
+
+import inf
+import rna_metrics
+from batch import DEFAULT_METRICS, evaluate, raise_keyboard_interrupt
+from mcq import calculate_mcq
+from results import ERROR_FAILED, ResultSink
+from rmsd import calculate_rmsd_structures
+from torsion import calculate_torsion_angles
+from window import positive_int
+
+STRUCTURE_EXTENSIONS = (".pdb", ".ent", ".cif")
+
+# Representations of a structure built from its content in the parse stage
+PARSERS = {
+    "content": lambda content: content,
+    "biopython": lambda content: PDB.PDBParser(QUIET=True).get_structure(
+        "structure", io.StringIO(content)
+    ),
+    "rnapolis": lambda content: read_3d_structure(io.StringIO(content)),
+}
+
+
+def unchanged(reference):
+    return reference
+
+
+def score_mcq(reference_angles, model_structure):
+    return calculate_mcq(reference_angles, calculate_torsion_angles(model_structure))
+
+
+def prepare_inf(mode):
+    return functools.partial(inf.find_interactions, mode=mode)
+
+
+def score_inf(mode):
+    def score(reference_interactions, model_structure):
+        return inf.score_interactions(
+            reference_interactions, inf.find_interactions(model_structure, mode), mode
+        )
+
+    return score
+
+
+# Metric name: (representation, preparation of the reference done once, scoring
+# of a prepared reference and a model representation)
+METRICS = {
+    "rmsd": ("biopython", unchanged, calculate_rmsd_structures),
+    "mcq": ("biopython", calculate_torsion_angles, score_mcq),
+    "inf": ("rnapolis", prepare_inf("all"), score_inf("all")),
+    "inf_canonical": ("rnapolis", prepare_inf("canonical"), score_inf("canonical")),
+    "inf_non_canonical": (
+        "rnapolis",
+        prepare_inf("non-canonical"),
+        score_inf("non-canonical"),
+    ),
+    "inf_stacking": ("rnapolis", prepare_inf("stacking"), score_inf("stacking")),
+    # lDDT unifies reference and model together, so it starts from content
+    "lddt": ("content", unchanged, rna_metrics.lddt),
+    "tm_score": ("content", unchanged, rna_metrics.tm_score),
+    "clashscore": (
+        "content",
+        unchanged,
+        lambda reference, model: rna_metrics.clashscore(model),
+    ),
+}
+
+# Marks the end of items in a queue, one per consuming worker
+DONE = object()
+
+
+def is_structure_file(name):
+    """Check if a file name looks like a (possibly gzipped) PDB or mmCIF file."""
+    name = name.lower().removesuffix(".gz")
+    return name.endswith(STRUCTURE_EXTENSIONS)
+
+
+def read_sources(sources):
+    """
+    Read raw content of structure files.
+
+    :param sources: Paths to files, directories (searched recursively), tar
+        archives (possibly compressed) or glob patterns
+    :return: Generator of (name, raw bytes) tuples, sources without any
+        structure file (e.g. missing paths) are reported on stderr
+    """
+    for source in sources:
+        found = False
+        for item in read_source(source):
+            found = True
+            yield item
+        if not found:
+            print(f"No structure files found in {source}", file=sys.stderr)
+
+
+def read_source(source):
+    """Read raw content of structure files from a single source."""
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for file in sorted(files):
+                if is_structure_file(file):
+                    path = os.path.join(root, file)
+                    with open(path, "rb") as f:
+                        yield path, f.read()
+    elif os.path.isfile(source) and tarfile.is_tarfile(source):
+        with tarfile.open(source) as archive:
+            for member in archive:
+                if member.isfile() and is_structure_file(member.name):
+                    with archive.extractfile(member) as f:
+                        yield f"{source}/{member.name}", f.read()
+    elif os.path.isfile(source):
+        with open(source, "rb") as f:
+            yield source, f.read()
+    else:
+        for path in sorted(glob.glob(source, recursive=True)):
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    yield path, f.read()
+
+
+def decode(raw):
+    """Decompress gzipped content if needed and decode it to text."""
+    if raw[:2] == b"\x1f\x8b":
+        raw = gzip.decompress(raw)
+    return raw.decode()
+
+
+def start_stage(function, inputs, outputs, workers, downstream_workers):
+    """
+    Start a pool of threads applying a function to items from a queue.
+
+    Items are (seq, name, payload) tuples. If the function fails, the item is
+    passed on with payload None, so that it still reaches the writer. Each
+    worker stops after receiving DONE. When all of them stop, DONE is put once
+    for every downstream worker.
+    """
+
+    def work():
+        while (item := inputs.get()) is not DONE:
+            seq, name, _ = item
+            try:
+                result = function(item)
+            except Exception as e:
+                print(f"Error processing {name}: {e}", file=sys.stderr)
+                result = seq, name, None
+            outputs.put(result)
+
+    def close():
+        for thread in threads:
+            thread.join()
+        for _ in range(downstream_workers):
+            outputs.put(DONE)
+
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    threading.Thread(target=close, daemon=True).start()
+
+
+def run_pipeline(
+    reference_content,
+    sources,
+    metrics,
+    write,
+    parse_workers=2,
+    score_workers=4,
+    max_in_flight=64,
+    ordered=True,
+):
+    """
+    Score structures read from sources in a pipeline of thread pools.
+
+    The reference is parsed and prepared once for every metric (e.g. its
+    torsion angles or interactions). Each model is decompressed, decoded and
+    parsed once in the parse stage into the representations needed by the
+    metrics, which are shared by all metrics in the score stage. Stages are
+    connected with bounded queues and at most max_in_flight models are held
+    in memory at any time, regardless of the number of inputs.
+
+    Parsing with Biopython and rnapolis is pure Python and holds the GIL, so it
+    does not run in parallel with scoring in Python code. Stages overlap in file
+    reading, decompression, numpy and in external programs like USalign.
+
+    :param reference_content: PDB or mmCIF content of the reference
+    :param sources: Files, directories, tar archives or glob patterns
+    :param metrics: List of metric names from METRICS
+    :param write: Function called with (name, metric, value, elapsed, error)
+    :param parse_workers: Number of threads decompressing and parsing input
+    :param score_workers: Number of threads calculating metrics
+    :param max_in_flight: Maximum number of models between reading and writing
+    :param ordered: If True, results are written in the order of inputs
+    :return: Number of models read from sources
+    """
+    parse_queue = queue.Queue(max_in_flight)
+    score_queue = queue.Queue(max_in_flight)
+    result_queue = queue.Queue(max_in_flight)
+    in_flight = threading.Semaphore(max_in_flight)
+    count = 0
+
+    # The reference is parsed and prepared once and shared by scoring threads
+    representations = {METRICS[metric][0] for metric in metrics}
+    reference = {name: PARSERS[name](reference_content) for name in representations}
+    prepared = {
+        metric: METRICS[metric][1](reference[METRICS[metric][0]]) for metric in metrics
+    }
+
+    def parse(item):
+        seq, name, raw = item
+        try:
+            content = decode(raw)
+        except Exception as e:
+            print(f"Error reading {name}: {e}", file=sys.stderr)
+            return seq, name, {}
+
+        parsed = {}
+        for representation in representations:
+            try:
+                parsed[representation] = PARSERS[representation](content)
+            except Exception as e:
+                print(f"Error parsing {name}: {e}", file=sys.stderr)
+        return seq, name, parsed
+
+    def score(item):
+        seq, name, parsed = item
+        parsed = parsed or {}
+        rows = []
+        for metric in metrics:
+            representation, _, function = METRICS[metric]
+            if representation in parsed:
+                value, elapsed, error = evaluate(
+                    function,
+                    prepared[metric],
+                    parsed[representation],
+                    f"{metric} for {name}",
+                )
+            else:
+                value, elapsed, error = math.nan, 0.0, ERROR_FAILED
+            rows.append((metric, value, elapsed, error))
+        return seq, name, rows
+
+    def read():
+        nonlocal count
+        try:
+            for seq, (name, raw) in enumerate(read_sources(sources)):
+                in_flight.acquire()
+                parse_queue.put((seq, name, raw))
+                count += 1
+        except (OSError, tarfile.TarError) as e:
+            print(f"Error reading input: {e}", file=sys.stderr)
+        finally:
+            for _ in range(parse_workers):
+                parse_queue.put(DONE)
+
+    threading.Thread(target=read, daemon=True).start()
+    start_stage(parse, parse_queue, score_queue, parse_workers, score_workers)
+    start_stage(score, score_queue, result_queue, score_workers, 1)
+
+    # Results arriving out of order wait here, bounded by max_in_flight
+    pending = {}
+    next_seq = 0
+
+    while (item := result_queue.get()) is not DONE:
+        if ordered:
+            pending[item[0]] = item
+            ready = []
+            while next_seq in pending:
+                ready.append(pending.pop(next_seq))
+                next_seq += 1
+        else:
+            ready = [item]
+
+        for _, name, rows in ready:
+            for row in rows or []:
+                write(name, *row)
+            in_flight.release()
+
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Score many models in a pipeline of reading, parsing and scoring."
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        help="Output directory for result row groups (default: stdout)",
+    )
+    parser.add_argument(
+        "--metrics",
+        "-m",
+        default=",".join(DEFAULT_METRICS),
+        help=f"Comma-separated metrics (available: {', '.join(METRICS)})",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=positive_int,
+        default=2,
+        help="Parsing threads (default: 2)",
+    )
+    parser.add_argument(
+        "--score-workers",
+        type=positive_int,
+        default=4,
+        help="Scoring threads (default: 4)",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=positive_int,
+        default=64,
+        help="Maximum number of models held in memory (default: 64)",
+    )
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="Write results as soon as they are ready instead of in input order",
+    )
+    parser.add_argument("reference", help="Reference PDB or mmCIF file")
+    parser.add_argument(
+        "sources",
+        nargs="+",
+        help="Model files, directories, tar archives or glob patterns",
+    )
+    args = parser.parse_args()
+
+    metrics = args.metrics.split(",")
+    for metric in metrics:
+        if metric not in METRICS:
+            parser.error(f"unknown metric: {metric}")
+
+    with open(args.reference, "rb") as f:
+        reference_content = decode(f.read())
+
+    # Make SIGTERM unwind like Ctrl+C, so that buffered rows get flushed
+    signal.signal(signal.SIGTERM, raise_keyboard_interrupt)
+
+    options = dict(
+        parse_workers=args.parse_workers,
+        score_workers=args.score_workers,
+        max_in_flight=args.max_in_flight,
+        ordered=not args.unordered,
+    )
+
+    if args.output:
+        with ResultSink(args.output) as sink:
+
+            def write(name, metric, value, elapsed, error):
+                sink.append(args.reference, name, metric, value, elapsed, error)
+
+            count = run_pipeline(
+                reference_content, args.sources, metrics, write, **options
+            )
+    else:
+
+        def write(name, metric, value, elapsed, error):
+            print(f"{name}\t{metric}\t{value:.4f}")
+
+        count = run_pipeline(reference_content, args.sources, metrics, write, **options)
+
+    if count == 0:
+        sys.exit("Error: no models were read from sources")
+
+
+if __name__ == "__main__":
+    main()
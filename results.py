@@ -0,0 +1,100 @@
+import glob
+import os
+
+import numpy as np
+
+# Error codes stored alongside every score
+ERROR_OK = 0
+ERROR_FAILED = 1
+ERROR_NAN = 2
+
+COLUMNS = ("reference", "model", "metric", "value", "time", "error")
+
+
+class ResultSink:
+    """
+    Append-only columnar store for metric results.
+
+    Rows are buffered in memory and written as row groups into a directory,
+    one .npz file per group with one array per column (e.g. ``000003.npz``).
+    Each group is written to a temporary file and moved into place, so a
+    crash or kill during a write never damages groups flushed earlier, and a
+    later run can continue writing to the same directory.
+
+    :param path: Path to the output directory, created if it does not exist
+    :param row_group_size: Number of rows buffered before a group is written
+    """
+
+    def __init__(self, path, row_group_size=4096):
+        self.path = path
+        self.row_group_size = row_group_size
+        self.rows = []
+        os.makedirs(path, exist_ok=True)
+        groups = list_row_groups(path)
+        self.group = int(os.path.basename(groups[-1])[:-4]) + 1 if groups else 0
+
+    def append(self, reference, model, metric, value, elapsed, error=ERROR_OK):
+        """Buffer a single result row and flush if the row group is full."""
+        self.rows.append((reference, model, metric, value, elapsed, error))
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows as a new row group."""
+        if not self.rows:
+            return
+
+        reference, model, metric, value, elapsed, error = zip(*self.rows)
+        arrays = {
+            "reference": np.array(reference, dtype=str),
+            "model": np.array(model, dtype=str),
+            "metric": np.array(metric, dtype=str),
+            "value": np.array(value, dtype=np.float64),
+            "time": np.array(elapsed, dtype=np.float64),
+            "error": np.array(error, dtype=np.int8),
+        }
+
+        group_path = os.path.join(self.path, f"{self.group:06d}.npz")
+        temp_path = os.path.join(self.path, f".{self.group:06d}.npz.tmp")
+        with open(temp_path, "wb") as f:
+            np.savez(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, group_path)
+
+        self.group += 1
+        self.rows = []
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Flush also on errors and KeyboardInterrupt to keep partial results
+        self.close()
+        return False
+
+
+def list_row_groups(path):
+    """List paths of row group files in a result directory, in order."""
+    return sorted(glob.glob(os.path.join(path, "[0-9]*.npz")))
+
+
+def read_results(path):
+    """
+    Load all row groups of a result directory.
+
+    :param path: Path to the directory written by ResultSink
+    :return: Dictionary mapping column name to a concatenated numpy array
+    """
+    columns = {column: [] for column in COLUMNS}
+    for group_path in list_row_groups(path):
+        with np.load(group_path, allow_pickle=False) as data:
+            for column in COLUMNS:
+                columns[column].append(data[column])
+    return {
+        column: np.concatenate(arrays) if arrays else np.array([])
+        for column, arrays in columns.items()
+    }
@@ -18,35 +18,149 @@ def extract_phosphorus_atoms(structure):
     return atoms
 
 
+def extract_phosphorus_coords(structure):
+    """Extract coordinates of phosphorus atoms as an array of shape (N, 3)."""
+    atoms = extract_phosphorus_atoms(structure)
+    return np.array([atom.get_coord() for atom in atoms], dtype=np.float64).reshape(
+        -1, 3
+    )
+
+
+def rmsd_from_moments(covariance, sum_of_squares, n):
+    """
+    Calculate RMSD after optimal superposition from second moments (Kabsch).
+
+    All arguments may have leading batch dimensions.
+
+    :param covariance: Array (..., 3, 3) with sum of outer products of centered
+        coordinates of the second and the first set of points
+    :param sum_of_squares: Array (...) with sum of squared centered coordinates
+        of both sets of points
+    :param n: Number of points
+    :return: Array (...) of RMSD values
+    """
+    u, s, vt = np.linalg.svd(covariance)
+
+    # Avoid reflections by flipping the smallest singular value
+    reflection = np.linalg.det(u) * np.linalg.det(vt) < 0
+    s[..., -1] = np.where(reflection, -s[..., -1], s[..., -1])
+
+    msd = (sum_of_squares - 2 * np.sum(s, axis=-1)) / n
+    return np.sqrt(np.maximum(msd, 0))
+
+
+def calculate_rmsd_batch(coords1, coords2):
+    """
+    Calculate RMSD after optimal superposition for stacks of coordinates.
+
+    :param coords1: Array of shape (N, 3) or (M, N, 3)
+    :param coords2: Array of shape (M, N, 3)
+    :return: Array of M RMSD values
+    """
+    centered1 = coords1 - coords1.mean(axis=-2, keepdims=True)
+    centered2 = coords2 - coords2.mean(axis=-2, keepdims=True)
+
+    covariance = np.swapaxes(centered2, -1, -2) @ centered1
+    sum_of_squares = np.sum(centered1**2, axis=(-2, -1)) + np.sum(
+        centered2**2, axis=(-2, -1)
+    )
+    return rmsd_from_moments(covariance, sum_of_squares, coords2.shape[-2])
+
+
+def calculate_window_rmsd(coords1, coords2, starts, ends):
+    """
+    Calculate RMSD after optimal superposition for windows of consecutive points.
+
+    Counts, sums, squared norms and outer products of coordinates are
+    accumulated into prefix sums, so the moments of any window are obtained by
+    subtraction and all windows are superimposed in one batch.
+
+    :param coords1: Array of shape (N, 3), NaN for missing points
+    :param coords2: Array of shape (N, 3), NaN for missing points
+    :param starts: Array with the first point of each window
+    :param ends: Array with the point after the last one of each window
+    :return: Array of RMSD values, NaN for windows without common points
+    """
+    valid = ~(np.isnan(coords1).any(axis=1) | np.isnan(coords2).any(axis=1))
+
+    # Center globally first to keep prefix sums small
+    x = np.where(valid[:, None], coords1 - np.mean(coords1[valid], axis=0), 0)
+    y = np.where(valid[:, None], coords2 - np.mean(coords2[valid], axis=0), 0)
+
+    def prefix(values):
+        return np.concatenate([np.zeros((1, *values.shape[1:])), np.cumsum(values, 0)])
+
+    count = prefix(valid.astype(np.float64))
+    sum1 = prefix(x)
+    sum2 = prefix(y)
+    squares = prefix(np.sum(x**2, axis=1) + np.sum(y**2, axis=1))
+    products = prefix(y[:, :, None] * x[:, None, :])
+
+    n = count[ends] - count[starts]
+    rmsd = np.full(len(n), np.nan)
+
+    # Superimpose only windows with at least one common point
+    windows = n > 0
+    starts, ends, n = starts[windows], ends[windows], n[windows]
+
+    s1 = sum1[ends] - sum1[starts]
+    s2 = sum2[ends] - sum2[starts]
+    covariance = (products[ends] - products[starts]) - np.einsum(
+        "wi,wj->wij", s2, s1
+    ) / n[:, None, None]
+    sum_of_squares = (squares[ends] - squares[starts]) - (
+        np.sum(s1**2, axis=1) + np.sum(s2**2, axis=1)
+    ) / n
+
+    rmsd[windows] = rmsd_from_moments(covariance, sum_of_squares, n)
+    return rmsd
+
+
 def calculate_rmsd(structure1_str, structure2_str):
     parser = PDB.PDBParser(QUIET=True)
     structure1 = parser.get_structure("structure1", io.StringIO(structure1_str))
     structure2 = parser.get_structure("structure2", io.StringIO(structure2_str))
+    return calculate_rmsd_structures(structure1, structure2)
+
 
+def calculate_rmsd_structures(structure1, structure2):
+    """
+    Calculate RMSD between phosphorus atoms of two parsed structures.
+
+    Neither structure is modified, so both may be shared between threads.
+    """
     atoms1 = extract_phosphorus_atoms(structure1)
     atoms2 = extract_phosphorus_atoms(structure2)
 
     if len(atoms1) != len(atoms2):
         raise ValueError("Phosphorus atoms count mismatch")
 
-    # Superimpose the structures
+    # Superimpose a copy of the coordinates, atom by atom in single precision
+    # like Superimposer.apply, so the result does not change
     sup = Superimposer()
     sup.set_atoms(atoms1, atoms2)
-    sup.apply(atoms2)
+    rotation, translation = (x.astype("f") for x in sup.rotran)
 
     # Calculate RMSD after superimposition
     coords1 = np.array([atom.get_coord() for atom in atoms1])
-    coords2 = np.array([atom.get_coord() for atom in atoms2])
+    coords2 = np.array(
+        [np.dot(atom.get_coord(), rotation) + translation for atom in atoms2]
+    )
 
     diff = coords1 - coords2
     rmsd = np.sqrt(np.sum(diff**2) / len(atoms1))
     return rmsd
 
 
-def main(pdb_file1, pdb_file2):
+def score_files(pdb_file1, pdb_file2):
+    """Calculate RMSD between phosphorus atoms of two PDB files."""
     with open(pdb_file1) as f:
         with open(pdb_file2) as g:
-            print(f"{calculate_rmsd(f.read(), g.read()):.4f}")
+            return calculate_rmsd(f.read(), g.read())
+
+
+def main(pdb_file1, pdb_file2):
+    print(f"{score_files(pdb_file1, pdb_file2):.4f}")
 
 
 if __name__ == "__main__":
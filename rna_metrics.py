@@ -0,0 +1,80 @@
+"""
+Library API for RNA structure metrics.
+
+Every function takes structures as PDB (or, where supported, mmCIF) content
+already loaded into memory and returns a float. Options are passed explicitly
+as config objects. The functions do not touch sys.argv, the current working
+directory or any module-level state, so they may be called concurrently from
+multiple threads.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+import requests
+
+from clashscore import BASE_URL, calculate_clashscore_content
+from inf import score_contents as inf_score_contents
+from lddt import score_contents as lddt_score_contents
+from mcq import score_contents as mcq_score_contents
+from rmsd import calculate_rmsd
+from tm_score import calculate_tm_score_contents
+
+
+@dataclass(frozen=True)
+class INFConfig:
+    """Interaction type: canonical, non-canonical, stacking or all"""
+
+    mode: str = "all"
+
+
+@dataclass(frozen=True)
+class LDDTConfig:
+    """Optional memory budget in bytes for tiled distance calculations"""
+
+    max_memory: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class TMScoreConfig:
+    """Path to USalign binary, if None it is found or built on first use"""
+
+    usalign_path: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ClashscoreConfig:
+    """MolProbity server and an optional requests session to reuse"""
+
+    base_url: str = BASE_URL
+    session: Optional[requests.Session] = None
+
+
+def rmsd(reference, model):
+    """RMSD between phosphorus atoms after optimal superposition."""
+    return calculate_rmsd(reference, model)
+
+
+def mcq(reference, model):
+    """Mean of Circular Quantities between torsion angles in degrees."""
+    return mcq_score_contents(reference, model)
+
+
+def inf(reference, model, config=INFConfig()):
+    """Interaction Network Fidelity for the configured interaction type."""
+    return inf_score_contents(reference, model, config.mode)
+
+
+def lddt(reference, model, config=LDDTConfig()):
+    """local Distance Difference Test score of unified structures."""
+    return lddt_score_contents(reference, model, config.max_memory)
+
+
+def tm_score(reference, model, config=TMScoreConfig()):
+    """TM-score calculated by USalign in a per-call temporary directory."""
+    return calculate_tm_score_contents(reference, model, config.usalign_path)
+
+
+def clashscore(model, config=ClashscoreConfig(), name="model.pdb"):
+    """Clashscore calculated by MolProbity in a per-call session."""
+    return calculate_clashscore_content(model, name, config.session, config.base_url)
@@ -0,0 +1,27 @@
+import pytest
+import os
+from batch import score_pairs
+from results import ERROR_OK, ResultSink, read_results
+
+
+class TestBatch:
+    def setup_method(self):
+        """Set up test fixtures with paths to test PDB files."""
+        self.pdb1 = "tests/1ehz.pdb"
+        self.pdb2 = "tests/1evv.pdb"
+
+        # Verify test files exist
+        assert os.path.exists(self.pdb1), f"Test file {self.pdb1} not found"
+        assert os.path.exists(self.pdb2), f"Test file {self.pdb2} not found"
+
+    def test_score_pairs(self, tmp_path):
+        """Test batch scoring into a result file."""
+        path = str(tmp_path / "results")
+
+        with ResultSink(path) as sink:
+            score_pairs([(self.pdb1, self.pdb2)], ["rmsd", "mcq"], sink)
+
+        results = read_results(path)
+        assert results["metric"].tolist() == ["rmsd", "mcq"]
+        assert results["value"] == pytest.approx([0.5935, 9.5274], abs=1e-4)
+        assert results["error"].tolist() == [ERROR_OK, ERROR_OK]
@@ -0,0 +1,69 @@
+import pytest
+import os
+import mcq
+from cascade import CascadeConfig, run_cascade, score_cheap
+from lddt import unify_contents
+from results import ResultSink, read_results
+
+
+class TestCascade:
+    def setup_method(self):
+        """Set up test fixtures with paths to test PDB files."""
+        self.pdb1 = "tests/1ehz.pdb"
+        self.pdb2 = "tests/1evv.pdb"
+
+        # Verify test files exist
+        assert os.path.exists(self.pdb1), f"Test file {self.pdb1} not found"
+        assert os.path.exists(self.pdb2), f"Test file {self.pdb2} not found"
+
+    def test_cascade(self, tmp_path):
+        """Test that only the best model gets expensive metrics."""
+        path = str(tmp_path / "results")
+        config = CascadeConfig(metrics=("inf",), keep_top=1)
+
+        with ResultSink(path) as sink:
+            stages = run_cascade(self.pdb1, [self.pdb2, self.pdb1], config, sink)
+
+        assert [count for _, count, _ in stages] == [2, 1, 1]
+
+        results = read_results(path)
+        assert results["metric"].tolist() == ["rmsd", "mcq", "rmsd", "mcq", "inf"]
+        assert results["value"] == pytest.approx(
+            [0.5935, 9.5274, 0.0, 0.0, 1.0], abs=1e-4
+        )
+        assert results["model"][-1] == self.pdb1, "The identical model should survive"
+
+    def test_score_cheap_chunks(self):
+        """Test that scoring chunk by chunk does not change results."""
+        models = [self.pdb2, self.pdb1, self.pdb2]
+        rmsd, mcq, _, failed = score_cheap(self.pdb1, models, chunk_size=2)
+        expected_rmsd, expected_mcq, _, _ = score_cheap(self.pdb1, models)
+
+        assert rmsd == pytest.approx(expected_rmsd)
+        assert mcq == pytest.approx(expected_mcq)
+        assert rmsd == pytest.approx([0.5935, 0.0, 0.5935], abs=1e-4)
+        assert not failed.any()
+
+    def test_mcq_without_water(self, tmp_path):
+        """Test that cheap MCQ equals mcq.py when chains do not end with water."""
+        with open(self.pdb1) as f1, open(self.pdb2) as f2:
+            unified_ref, unified_model = unify_contents(f1.read(), f2.read())
+        reference, model = tmp_path / "reference.pdb", tmp_path / "model.pdb"
+        reference.write_text(unified_ref)
+        model.write_text(unified_model)
+
+        _, cheap_mcq, _, _ = score_cheap(str(reference), [str(model)])
+        expected = mcq.score_files(str(reference), str(model))
+        assert cheap_mcq[0] == pytest.approx(expected)
+        assert expected == pytest.approx(8.3207, abs=1e-4)
+
+    def test_invalid_options(self):
+        """Test that empty chunks and negative or zero limits are rejected."""
+        with pytest.raises(ValueError):
+            score_cheap(self.pdb1, [self.pdb2], chunk_size=0)
+        with pytest.raises(ValueError):
+            CascadeConfig(keep_top=-1)
+        with pytest.raises(ValueError):
+            CascadeConfig(keep_fraction=0.0)
+        with pytest.raises(ValueError):
+            CascadeConfig(keep_fraction=1.5)
@@ -0,0 +1,70 @@
+import pytest
+import io
+import os
+import numpy as np
+from incremental import IncrementalScorer
+from inf import score_contents as inf_score_contents
+from lddt import PreparedReference, calculate_lddt, extract_atoms, unify_contents
+from mcq import calculate_mcq_array
+from torsion import calculate_torsion_table
+from Bio.PDB import PDBIO, PDBParser
+
+
+class TestIncremental:
+    def setup_method(self):
+        """Set up test fixtures with unified test structures."""
+        self.pdb1 = "tests/1ehz.pdb"
+        self.pdb2 = "tests/1evv.pdb"
+
+        # Verify test files exist
+        assert os.path.exists(self.pdb1), f"Test file {self.pdb1} not found"
+        assert os.path.exists(self.pdb2), f"Test file {self.pdb2} not found"
+
+        with open(self.pdb1) as f1, open(self.pdb2) as f2:
+            unified_ref, unified_model = unify_contents(f1.read(), f2.read())
+
+        self.unified_ref = unified_ref
+        parser = PDBParser(QUIET=True)
+        self.reference = parser.get_structure("reference", io.StringIO(unified_ref))
+        self.model = parser.get_structure("model", io.StringIO(unified_model))
+
+    def test_incremental_updates(self):
+        """Test that incremental scores match scores calculated from scratch."""
+        scorer = IncrementalScorer(self.reference)
+        scores = scorer.score(self.model)
+        assert scores["lddt"] == calculate_lddt(self.reference, self.model)
+        assert scores["inf_stacking"] == inf_score_contents(
+            self.unified_ref, self.write(self.model), "stacking"
+        )
+
+        prepared = PreparedReference(self.reference)
+        _, ref_angles = calculate_torsion_table(self.reference)
+        coords, _ = extract_atoms(self.model)
+        rng = np.random.default_rng(0)
+
+        for _ in range(3):
+            # Move a few atoms like a refinement step would
+            coords = coords.copy()
+            moved = rng.choice(len(coords), 20, replace=False)
+            coords[moved] += rng.normal(0, 1, (20, 3)).astype(coords.dtype)
+            scores = scorer.score_coords(coords)
+
+            for atom, coord in zip(self.model.get_atoms(), coords):
+                atom.coord = coord
+            _, angles = calculate_torsion_table(self.model)
+
+            assert scores["lddt"] == prepared.score_coords(coords)
+            assert scores["mcq"] == pytest.approx(
+                calculate_mcq_array(ref_angles[:, :7], angles[:, :7])
+            )
+            assert scores["inf_stacking"] == inf_score_contents(
+                self.unified_ref, self.write(self.model), "stacking"
+            )
+
+    def write(self, structure):
+        """Write a structure as PDB content."""
+        buffer = io.StringIO()
+        pdbio = PDBIO()
+        pdbio.set_structure(structure)
+        pdbio.save(buffer)
+        return buffer.getvalue()
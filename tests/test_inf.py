@@ -1,6 +1,8 @@
 import pytest
 import os
-from inf import process_structure, calculate_inf
+from rnapolis.annotator import extract_base_interactions
+from rnapolis.parser import read_3d_structure
+from inf import annotate, process_structure, calculate_inf, score_files
 
 
 class TestINF:
@@ -50,3 +52,26 @@ class TestINF:
         assert score == pytest.approx(0.9570, abs=1e-4), (
             "All interactions INF score should be 0.9570"
         )
+
+    @pytest.mark.parametrize("mode", ["all", "canonical", "non-canonical", "stacking"])
+    def test_annotate_matches_full_annotation(self, mode):
+        """Test that annotation for a single mode finds the same interactions."""
+        for pdb_file in [self.pdb1, self.pdb2]:
+            with open(pdb_file) as f:
+                structure = read_3d_structure(f)
+            expected = extract_base_interactions(structure)
+            interactions = annotate(structure, mode)
+
+            if mode != "stacking":
+                assert interactions.base_pairs == expected.base_pairs
+            else:
+                assert interactions.base_pairs == []
+            if mode not in ("canonical", "non-canonical"):
+                assert interactions.stackings == expected.stackings
+            else:
+                assert interactions.stackings == []
+
+    def test_score_files_stacking(self):
+        """Test INF calculation for a single mode from files."""
+        score = score_files(self.pdb1, self.pdb2, "stacking")
+        assert score == pytest.approx(0.9506, abs=1e-4)
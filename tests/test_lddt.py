@@ -1,7 +1,8 @@
 import pytest
 import os
 import shutil
-from lddt import calculate_lddt, unify_structures
+import numpy as np
+from lddt import PreparedReference, calculate_lddt, unify_structures
 from Bio.PDB import PDBParser
 
 
@@ -33,3 +34,48 @@ class TestLDDT:
         finally:
             # Clean up temporary directory
             shutil.rmtree(temp_dir)
+
+    def test_prepared_reference_stack(self):
+        """Test scoring a stack of models against a prepared reference."""
+        unified_ref, unified_model, temp_dir = unify_structures(self.pdb1, self.pdb2)
+
+        try:
+            parser = PDBParser()
+            reference_structure = parser.get_structure("reference", unified_ref)
+            model_structure = parser.get_structure("model", unified_model)
+
+            prepared = PreparedReference(reference_structure)
+            ref_coords = np.array(
+                [atom.coord for atom in reference_structure.get_atoms()]
+            )
+            model_coords = np.array(
+                [atom.coord for atom in model_structure.get_atoms()]
+            )
+
+            scores = prepared.score_coords(np.stack([model_coords, ref_coords]))
+            assert scores == pytest.approx([0.9907, 1.0], abs=1e-4), (
+                "lDDT scores should be 0.9907 and 1.0"
+            )
+            assert prepared.score(model_structure) == pytest.approx(scores[0])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_lddt_max_memory(self):
+        """Test that tiled lDDT calculation gives the same score."""
+        unified_ref, unified_model, temp_dir = unify_structures(self.pdb1, self.pdb2)
+
+        try:
+            parser = PDBParser()
+            reference_structure = parser.get_structure("reference", unified_ref)
+            model_structure = parser.get_structure("model", unified_model)
+
+            expected = calculate_lddt(reference_structure, model_structure)
+            for max_memory in [1024, 1024**2]:
+                lddt_score = calculate_lddt(
+                    reference_structure, model_structure, max_memory
+                )
+                assert lddt_score == expected, (
+                    f"lDDT score with {max_memory} bytes budget should be {expected}"
+                )
+        finally:
+            shutil.rmtree(temp_dir)
@@ -1,7 +1,8 @@
 import pytest
 import os
-from mcq import calculate_mcq
-from torsion import calculate_torsion_angles
+import numpy as np
+from mcq import align_torsion_table, calculate_mcq, calculate_mcq_array
+from torsion import calculate_torsion_angles, calculate_torsion_table
 from Bio import PDB
 
 
@@ -23,7 +24,24 @@ class TestMCQ:
         self.angles1 = calculate_torsion_angles(structure1)
         self.angles2 = calculate_torsion_angles(structure2)
 
+        self.table1 = calculate_torsion_table(structure1)
+        self.table2 = calculate_torsion_table(structure2)
+
     def test_mcq_calculation(self):
         """Test MCQ calculation between two structures."""
         mcq = calculate_mcq(self.angles1, self.angles2)
         assert mcq == pytest.approx(9.5274, abs=1e-4), "MCQ score should be 9.5274"
+
+    def test_mcq_array(self):
+        """Test vectorized MCQ calculation on aligned torsion tables."""
+        index1, angles1 = self.table1
+        index2, angles2 = self.table2
+        aligned2 = align_torsion_table(index1, index2, angles2)
+
+        # The first seven columns are the angles used by calculate_mcq
+        mcq = calculate_mcq_array(
+            angles1[:, :7], np.stack([aligned2, angles1])[..., :7]
+        )
+        assert mcq == pytest.approx([9.5274, 0.0], abs=1e-4), (
+            "MCQ scores should be 9.5274 and 0.0"
+        )
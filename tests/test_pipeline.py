@@ -0,0 +1,146 @@
+import gzip
+import os
+import tarfile
+import threading
+
+import pytest
+
+import rna_metrics
+from pipeline import read_sources, run_pipeline
+from results import ERROR_FAILED, ERROR_OK
+
+
+class TestPipeline:
+    def setup_method(self):
+        """Set up test fixtures with paths to test PDB files."""
+        self.pdb1 = "tests/1ehz.pdb"
+        self.pdb2 = "tests/1evv.pdb"
+
+        # Verify test files exist
+        assert os.path.exists(self.pdb1), f"Test file {self.pdb1} not found"
+        assert os.path.exists(self.pdb2), f"Test file {self.pdb2} not found"
+
+        with open(self.pdb1) as f:
+            self.reference = f.read()
+
+    def make_sources(self, tmp_path):
+        """Create a directory with gzipped models and a tarball of it."""
+        models = tmp_path / "models"
+        models.mkdir()
+        with open(self.pdb2, "rb") as f:
+            content = f.read()
+        for i in range(3):
+            (models / f"model{i}.pdb.gz").write_bytes(gzip.compress(content))
+        (models / "notes.txt").write_text("not a structure")
+
+        archive = tmp_path / "models.tar.gz"
+        with tarfile.open(archive, "w:gz") as tar:
+            tar.add(models, arcname="models")
+        return [str(models), str(archive)]
+
+    def test_read_sources(self, tmp_path):
+        """Test that directories and tarballs yield structure files only."""
+        names = [name for name, _ in read_sources(self.make_sources(tmp_path))]
+        assert len(names) == 6
+        assert all(name.endswith(".pdb.gz") for name in names)
+
+    @pytest.mark.parametrize("ordered", [True, False])
+    def test_run_pipeline(self, tmp_path, ordered):
+        """Test that all models are scored, in input order if requested."""
+        sources = self.make_sources(tmp_path)
+        rows = []
+
+        run_pipeline(
+            self.reference,
+            sources,
+            ["rmsd", "mcq"],
+            lambda *row: rows.append(row),
+            score_workers=3,
+            max_in_flight=2,
+            ordered=ordered,
+        )
+
+        names = [name for name, _ in read_sources(sources)]
+        if ordered:
+            assert [row[0] for row in rows[::2]] == names
+        assert sorted(row[0] for row in rows[::2]) == sorted(names)
+
+        for name, metric, value, _, error in rows:
+            expected = 0.5935 if metric == "rmsd" else 9.5274
+            assert value == pytest.approx(expected, abs=1e-4)
+            assert error == ERROR_OK
+
+    def test_corrupt_gzip(self, tmp_path):
+        """Test that a corrupt file is reported and does not stall the pipeline."""
+        with open(self.pdb2, "rb") as f:
+            compressed = bytearray(gzip.compress(f.read()))
+        # Damage the deflate stream, which raises zlib.error rather than OSError
+        compressed[20:40] = b"\xff" * 20
+        (tmp_path / "corrupt.pdb.gz").write_bytes(compressed)
+        for i in range(5):
+            with open(self.pdb2, "rb") as f:
+                (tmp_path / f"model{i}.pdb.gz").write_bytes(gzip.compress(f.read()))
+
+        rows = []
+        thread = threading.Thread(
+            target=run_pipeline,
+            args=(
+                self.reference,
+                [str(tmp_path)],
+                ["rmsd"],
+                lambda *row: rows.append(row),
+            ),
+            kwargs=dict(max_in_flight=2),
+            daemon=True,
+        )
+        thread.start()
+        thread.join(timeout=120)
+        assert not thread.is_alive(), "Pipeline did not finish"
+
+        assert len(rows) == 6
+        name, _, _, _, error = rows[0]
+        assert name.endswith("corrupt.pdb.gz")
+        assert error == ERROR_FAILED
+        for _, _, value, _, error in rows[1:]:
+            assert value == pytest.approx(0.5935, abs=1e-4)
+            assert error == ERROR_OK
+
+    def test_prepared_reference_matches_library(self, tmp_path):
+        """Test that scores against a prepared reference equal the library API."""
+        with open(self.pdb2) as f:
+            model = f.read()
+        metrics = ["rmsd", "mcq", "inf", "inf_stacking", "lddt"]
+        rows = []
+
+        run_pipeline(
+            self.reference, [self.pdb2], metrics, lambda *row: rows.append(row)
+        )
+
+        expected = [
+            rna_metrics.rmsd(self.reference, model),
+            rna_metrics.mcq(self.reference, model),
+            rna_metrics.inf(self.reference, model),
+            rna_metrics.inf(self.reference, model, rna_metrics.INFConfig("stacking")),
+            rna_metrics.lddt(self.reference, model),
+        ]
+        assert [row[1] for row in rows] == metrics
+        assert [row[2] for row in rows] == pytest.approx(expected, abs=1e-9)
+
+    def test_missing_source(self, tmp_path, capsys):
+        """Test that sources without structure files are reported."""
+        missing = str(tmp_path / "missing.pdb")
+        rows = []
+
+        count = run_pipeline(
+            self.reference,
+            [missing, self.pdb2],
+            ["rmsd"],
+            lambda *row: rows.append(row),
+        )
+
+        assert count == 1
+        assert [row[0] for row in rows] == [self.pdb2]
+        assert f"No structure files found in {missing}" in capsys.readouterr().err
+
+        count = run_pipeline(self.reference, [missing], ["rmsd"], print)
+        assert count == 0
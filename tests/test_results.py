@@ -0,0 +1,67 @@
+import pytest
+import numpy as np
+from results import ERROR_FAILED, ERROR_OK, ResultSink, read_results
+
+
+class TestResultSink:
+    def test_row_groups(self, tmp_path):
+        """Test that rows are written in groups and read back in order."""
+        path = str(tmp_path / "results")
+
+        with ResultSink(path, row_group_size=2) as sink:
+            sink.append("ref.pdb", "model1.pdb", "rmsd", 0.5, 0.1)
+            sink.append("ref.pdb", "model1.pdb", "mcq", 9.5, 0.2)
+            sink.append("ref.pdb", "model2.pdb", "rmsd", np.nan, 0.3, ERROR_FAILED)
+
+        results = read_results(path)
+        assert results["model"].tolist() == ["model1.pdb", "model1.pdb", "model2.pdb"]
+        assert results["metric"].tolist() == ["rmsd", "mcq", "rmsd"]
+        assert results["value"][:2] == pytest.approx([0.5, 9.5])
+        assert np.isnan(results["value"][2])
+        assert results["error"].tolist() == [ERROR_OK, ERROR_OK, ERROR_FAILED]
+
+    def test_append_to_existing(self, tmp_path):
+        """Test that a second sink continues an existing file."""
+        path = str(tmp_path / "results")
+
+        with ResultSink(path) as sink:
+            sink.append("ref.pdb", "model1.pdb", "rmsd", 0.5, 0.1)
+        with ResultSink(path) as sink:
+            sink.append("ref.pdb", "model2.pdb", "rmsd", 0.7, 0.1)
+
+        results = read_results(path)
+        assert results["model"].tolist() == ["model1.pdb", "model2.pdb"]
+
+    def test_flush_on_interrupt(self, tmp_path):
+        """Test that buffered rows are flushed when scoring is interrupted."""
+        path = str(tmp_path / "results")
+
+        with pytest.raises(KeyboardInterrupt):
+            with ResultSink(path) as sink:
+                sink.append("ref.pdb", "model1.pdb", "rmsd", 0.5, 0.1)
+                raise KeyboardInterrupt
+
+        assert read_results(path)["value"] == pytest.approx([0.5])
+
+    def test_failed_flush_keeps_earlier_groups(self, tmp_path, monkeypatch):
+        """Test that a write failing midway does not damage flushed groups."""
+        path = str(tmp_path / "results")
+
+        with ResultSink(path, row_group_size=1) as sink:
+            sink.append("ref.pdb", "model1.pdb", "rmsd", 0.5, 0.1)
+
+        def fail_midway(f, **arrays):
+            f.write(b"partial")
+            raise OSError("No space left on device")
+
+        monkeypatch.setattr(np, "savez", fail_midway)
+        sink = ResultSink(path, row_group_size=1)
+        with pytest.raises(OSError):
+            sink.append("ref.pdb", "model2.pdb", "rmsd", 0.7, 0.1)
+        monkeypatch.undo()
+
+        assert read_results(path)["model"].tolist() == ["model1.pdb"]
+
+        with ResultSink(path) as sink:
+            sink.append("ref.pdb", "model3.pdb", "rmsd", 0.9, 0.1)
+        assert read_results(path)["model"].tolist() == ["model1.pdb", "model3.pdb"]
@@ -1,6 +1,8 @@
 import pytest
 import os
-from rmsd import calculate_rmsd
+import numpy as np
+from Bio import PDB
+from rmsd import calculate_rmsd, calculate_rmsd_batch, extract_phosphorus_coords
 
 
 class TestRMSD:
@@ -20,3 +22,14 @@ class TestRMSD:
             assert rmsd == pytest.approx(0.5935, abs=1e-4), (
                 "RMSD score should be 0.5935"
             )
+
+    def test_rmsd_batch(self):
+        """Test vectorized RMSD calculation for a stack of models."""
+        parser = PDB.PDBParser(QUIET=True)
+        coords1 = extract_phosphorus_coords(parser.get_structure("s1", self.pdb1))
+        coords2 = extract_phosphorus_coords(parser.get_structure("s2", self.pdb2))
+
+        rmsd = calculate_rmsd_batch(coords1, np.stack([coords2, coords1]))
+        assert rmsd == pytest.approx([0.5935, 0.0], abs=1e-4), (
+            "RMSD scores should be 0.5935 and 0.0"
+        )
@@ -0,0 +1,42 @@
+import pytest
+import os
+from concurrent.futures import ThreadPoolExecutor
+import rna_metrics
+from rna_metrics import INFConfig
+
+
+class TestRNAMetrics:
+    def setup_method(self):
+        """Set up test fixtures with contents of test PDB files."""
+        self.pdb1 = "tests/1ehz.pdb"
+        self.pdb2 = "tests/1evv.pdb"
+
+        # Verify test files exist
+        assert os.path.exists(self.pdb1), f"Test file {self.pdb1} not found"
+        assert os.path.exists(self.pdb2), f"Test file {self.pdb2} not found"
+
+        with open(self.pdb1) as f1, open(self.pdb2) as f2:
+            self.content1 = f1.read()
+            self.content2 = f2.read()
+
+    def test_metrics_in_threads(self):
+        """Test that metrics give the same scores when run concurrently."""
+        calls = [
+            (rna_metrics.rmsd, (), 0.5935),
+            (rna_metrics.mcq, (), 9.5274),
+            (rna_metrics.inf, (), 0.9570),
+            (rna_metrics.inf, (INFConfig("stacking"),), 0.9506),
+            (rna_metrics.lddt, (), 0.9907),
+        ] * 2
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [
+                executor.submit(function, self.content1, self.content2, *args)
+                for function, args, _ in calls
+            ]
+            scores = [future.result() for future in futures]
+
+        for score, (function, _, expected) in zip(scores, calls):
+            assert score == pytest.approx(expected, abs=1e-4), (
+                f"{function.__name__} score should be {expected}"
+            )
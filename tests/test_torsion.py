@@ -0,0 +1,59 @@
+import pytest
+import os
+import numpy as np
+from torsion import (
+    TABLE_ANGLES,
+    calculate_torsion_angles,
+    calculate_torsion_table,
+    export_torsion_table,
+)
+from Bio import PDB
+
+
+class TestTorsion:
+    def setup_method(self):
+        """Set up test fixtures with a path to a test PDB file."""
+        self.pdb1 = "tests/1ehz.pdb"
+
+        # Verify test file exists
+        assert os.path.exists(self.pdb1), f"Test file {self.pdb1} not found"
+
+        parser = PDB.PDBParser(QUIET=True)
+        self.structure1 = parser.get_structure("struct1", self.pdb1)
+
+    def test_torsion_table(self):
+        """Test that the torsion table matches angles calculated per residue."""
+        angles = calculate_torsion_angles(self.structure1)
+        index, table = calculate_torsion_table(self.structure1)
+
+        assert len(index) == len(angles)
+        for residue, row in zip(index, table):
+            res_id = f"{residue['chain']}:{residue['number']}"
+            for k, angle_name in enumerate(TABLE_ANGLES[:7]):
+                if angle_name in angles[res_id]:
+                    assert row[k] == pytest.approx(angles[res_id][angle_name])
+                else:
+                    assert np.isnan(row[k])
+
+    def test_sugar_pucker(self):
+        """Test that residues of the A-form helix have C3'-endo sugar pucker."""
+        index, table = calculate_torsion_table(self.structure1)
+        phase = table[1:6, TABLE_ANGLES.index("P")]
+        amplitude = table[1:6, TABLE_ANGLES.index("tm")]
+
+        assert np.all((0 < phase) & (phase < 36)), "Pucker should be C3'-endo"
+        assert np.all((30 < amplitude) & (amplitude < 50))
+
+    def test_export(self, tmp_path):
+        """Test that the exported table can be memory-mapped."""
+        path = str(tmp_path / "torsion.npy")
+        export_torsion_table(self.structure1, path)
+
+        index, table = calculate_torsion_table(self.structure1)
+        nucleotide = ~np.isnan(table).all(axis=1)
+        exported = np.load(path, mmap_mode="r")
+        assert len(exported) == 76, "Water should not be exported"
+        assert exported["number"].tolist() == index["number"][nucleotide].tolist()
+        np.testing.assert_array_equal(
+            exported["chi"], table[nucleotide, TABLE_ANGLES.index("chi")]
+        )
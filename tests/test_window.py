@@ -0,0 +1,92 @@
+import pytest
+import io
+import os
+import numpy as np
+import mcq
+from lddt import unify_contents
+from mcq import align_torsion_table
+from rmsd import calculate_rmsd_batch
+from window import calculate_windows, load_residue_features, window_bounds
+from Bio import PDB
+
+
+class TestWindow:
+    def setup_method(self):
+        """Set up test fixtures with paths to test PDB files."""
+        self.pdb1 = "tests/1ehz.pdb"
+        self.pdb2 = "tests/1evv.pdb"
+
+        # Verify test files exist
+        assert os.path.exists(self.pdb1), f"Test file {self.pdb1} not found"
+        assert os.path.exists(self.pdb2), f"Test file {self.pdb2} not found"
+
+        parser = PDB.PDBParser(QUIET=True)
+        self.structure1 = parser.get_structure("struct1", self.pdb1)
+        self.structure2 = parser.get_structure("struct2", self.pdb2)
+
+    def test_window_bounds(self):
+        """Test that windows do not cross chain boundaries."""
+        chains = np.array(["A"] * 5 + ["B"] * 3)
+        starts, ends = window_bounds(chains, width=4, stride=1)
+        assert list(zip(starts, ends)) == [(0, 4), (1, 5), (5, 8)]
+
+        starts, ends = window_bounds(chains, width=4, stride=1, per_chain=True)
+        assert list(zip(starts, ends)) == [(0, 5), (5, 8)]
+
+    def test_window_bounds_tail(self):
+        """Test that residues skipped by the stride get a final window."""
+        chains = np.array(["A"] * 10)
+        starts, ends = window_bounds(chains, width=4, stride=4)
+        assert list(zip(starts, ends)) == [(0, 4), (4, 8), (6, 10)]
+
+        starts, ends = window_bounds(np.array([], dtype=str), width=4, stride=1)
+        assert len(starts) == 0 and len(ends) == 0
+
+    def test_per_chain(self):
+        """Test that per-chain scores equal global RMSD and MCQ."""
+        windows = calculate_windows(self.structure1, self.structure2, per_chain=True)
+        assert len(windows) == 1
+        chain, _, _, rmsd, mcq = windows[0]
+        assert chain == "A"
+        assert rmsd == pytest.approx(0.5935, abs=1e-4), "RMSD score should be 0.5935"
+        assert mcq == pytest.approx(9.5274, abs=1e-4), "MCQ score should be 9.5274"
+
+    def test_per_chain_without_water(self):
+        """Test per-chain MCQ against mcq.py on chains not ending with water."""
+        with open(self.pdb1) as f1, open(self.pdb2) as f2:
+            unified_ref, unified_model = unify_contents(f1.read(), f2.read())
+        parser = PDB.PDBParser(QUIET=True)
+        structure1 = parser.get_structure("struct1", io.StringIO(unified_ref))
+        structure2 = parser.get_structure("struct2", io.StringIO(unified_model))
+
+        windows = calculate_windows(structure1, structure2, per_chain=True)
+        assert len(windows) == 1
+        assert windows[0][4] == pytest.approx(
+            mcq.score_contents(unified_ref, unified_model)
+        )
+
+    def test_no_nucleotides(self):
+        """Test that a structure without nucleotides gives no windows."""
+        empty = PDB.Structure.Structure("empty")
+        assert calculate_windows(empty, self.structure2) == []
+
+    def test_window_rmsd(self):
+        """Test window RMSD against superposition of the window alone."""
+        windows = calculate_windows(self.structure1, self.structure2, 20, 10)
+        assert [window[1] for window in windows] == [1, 11, 21, 31, 41, 51, 57]
+
+        index1, phosphorus1, _ = load_residue_features(self.structure1)
+        index2, phosphorus2, _ = load_residue_features(self.structure2)
+        phosphorus2 = align_torsion_table(index1, index2, phosphorus2)
+        window1, window2 = phosphorus1[30:50], phosphorus2[30:50]
+        has_p = ~np.isnan(window1).any(axis=1)
+        expected = calculate_rmsd_batch(window1[has_p], window2[has_p][None])[0]
+        assert windows[3][3] == pytest.approx(expected)
+
+    def test_window_bounds_invalid(self):
+        """Test that empty windows or zero stride are rejected."""
+        chains = np.array(["A"] * 5)
+        with pytest.raises(ValueError):
+            window_bounds(chains, width=0, stride=1)
+        with pytest.raises(ValueError):
+            window_bounds(chains, width=4, stride=0)
@@ -1,10 +1,26 @@
 #! /usr/bin/env python
+import io
 import os
 import shutil
 import subprocess
 import sys
+import tempfile
+import threading
 import urllib.request
 
+from rnapolis.parser import is_cif
+
+
+USALIGN_URL = "https://zhanggroup.org/US-align/bin/module/USalign.cpp"
+
+usalign_lock = threading.Lock()
+
+
+def usalign_cache_dir():
+    """Directory with the USalign binary built by prepare_usalign"""
+    cache_home = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(cache_home, "rna-metrics")
+
 
 def prepare_usalign():
     """Find USalign in PATH or download and compile if not present"""
@@ -13,27 +29,41 @@ def prepare_usalign():
     if usalign_path:
         return usalign_path
 
-    # If not in PATH, check current directory
-    if os.path.exists("USalign"):
-        return "./USalign"
+    # If not in PATH, check the cache directory
+    cached_path = os.path.join(usalign_cache_dir(), "USalign")
 
-    # Download and compile
-    if not os.path.exists("USalign.cpp"):
-        url = "https://zhanggroup.org/US-align/bin/module/USalign.cpp"
-        urllib.request.urlretrieve(url, "USalign.cpp")
+    with usalign_lock:
+        if os.path.exists(cached_path):
+            return cached_path
 
-    subprocess.run(
-        ["g++", "-static", "-O3", "-ffast-math", "-o", "USalign", "USalign.cpp"],
-        check=True,
-    )
-    return "./USalign"
+        # Download and compile in a private directory, then move into the cache
+        os.makedirs(usalign_cache_dir(), exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=usalign_cache_dir()) as build_dir:
+            source_path = os.path.join(build_dir, "USalign.cpp")
+            binary_path = os.path.join(build_dir, "USalign")
+            urllib.request.urlretrieve(USALIGN_URL, source_path)
+            subprocess.run(
+                [
+                    "g++",
+                    "-static",
+                    "-O3",
+                    "-ffast-math",
+                    "-o",
+                    binary_path,
+                    source_path,
+                ],
+                check=True,
+            )
+            os.replace(binary_path, cached_path)
+
+    return cached_path
 
 
-def calculate_tm_score(structure1_path, structure2_path):
+def calculate_tm_score(structure1_path, structure2_path, usalign_path=None):
     """Calculate TM-score between two structures using USalign"""
-    prepare_usalign()
+    if usalign_path is None:
+        usalign_path = prepare_usalign()
 
-    usalign_path = prepare_usalign()
     result = subprocess.run(
         [usalign_path, structure1_path, structure2_path, "-outfmt", "2"],
         capture_output=True,
@@ -51,6 +81,21 @@ def calculate_tm_score(structure1_path, structure2_path):
     return tm_score
 
 
+def calculate_tm_score_contents(content1, content2, usalign_path=None):
+    """Calculate TM-score between two structures given as PDB or mmCIF content"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = []
+        for i, content in enumerate((content1, content2), start=1):
+            # USalign recognizes mmCIF input by the file extension
+            ext = ".cif" if is_cif(io.StringIO(content)) else ".pdb"
+            path = os.path.join(temp_dir, f"structure{i}{ext}")
+            with open(path, "w") as f:
+                f.write(content)
+            paths.append(path)
+
+        return calculate_tm_score(paths[0], paths[1], usalign_path)
+
+
 def main(pdb_file1, pdb_file2):
     """Main function to calculate TM-score between two PDB files"""
     try:
@@ -44,6 +44,8 @@ def calculate_torsion_angles(structure):
                 # Initialize variables
                 O3_prev = None
                 next_residue = None
+                P_next = None
+                O5_next = None
 
                 if i > 0:
                     prev_residue = residues[i - 1]
@@ -109,6 +111,217 @@ def calculate_torsion_angles(structure):
     return angles
 
 
+# Angles in the torsion table, P and tm describe the sugar pucker
+TABLE_ANGLES = [
+    "alpha",
+    "beta",
+    "gamma",
+    "delta",
+    "epsilon",
+    "zeta",
+    "chi",
+    "eta",
+    "theta",
+    "P",
+    "tm",
+]
+
+# Atoms gathered per residue, base atoms depend on purine/pyrimidine
+GATHERED_ATOMS = ["P", "O5'", "C5'", "C4'", "C3'", "O3'", "C2'", "C1'", "O4'"]
+PURINE_BASE_ATOMS = ["N9", "C4"]
+PYRIMIDINE_BASE_ATOMS = ["N1", "C2"]
+
+
+def calculate_torsion_angle_array(p1, p2, p3, p4):
+    """Calculate torsion angles for arrays of points with shape (..., 3).
+
+    Missing atoms are represented by NaN coordinates and give NaN angles.
+    """
+    v1 = p2 - p1
+    v2 = p3 - p2
+    v3 = p4 - p3
+
+    n1 = np.cross(v1, v2)
+    n2 = np.cross(v2, v3)
+
+    # Normalize vectors
+    with np.errstate(invalid="ignore", divide="ignore"):
+        n1 = n1 / np.linalg.norm(n1, axis=-1, keepdims=True)
+        n2 = n2 / np.linalg.norm(n2, axis=-1, keepdims=True)
+        v2 = v2 / np.linalg.norm(v2, axis=-1, keepdims=True)
+
+    # Calculate angle
+    angle = np.arctan2(np.sum(np.cross(n1, n2) * v2, axis=-1), np.sum(n1 * n2, axis=-1))
+    return np.degrees(angle)
+
+
+def gather_atom_indices(structure):
+    """Find atoms needed for torsion angles of all residues.
+
+    Returns:
+        Tuple of (index, atom_indices, same_chain_prev) where index is a
+        structured array with chain, number, icode and name of residues,
+        atom_indices is an array of shape (n_residues, len(GATHERED_ATOMS) + 2)
+        with positions of atoms in structure.get_atoms() or -1 for missing atoms
+        (the last two are base atoms for chi) and same_chain_prev tells if the
+        previous residue belongs to the same chain
+    """
+    positions = {id(atom): k for k, atom in enumerate(structure.get_atoms())}
+    ids = []
+    rows = []
+    same_chain_prev = []
+
+    for model in structure:
+        for chain in model:
+            for i, residue in enumerate(chain):
+                if residue.resname in ["A", "G"]:  # Purines
+                    base_atoms = PURINE_BASE_ATOMS
+                else:  # Pyrimidines
+                    base_atoms = PYRIMIDINE_BASE_ATOMS
+
+                rows.append(
+                    [
+                        positions[id(residue[atom_name])]
+                        if atom_name in residue
+                        else -1
+                        for atom_name in GATHERED_ATOMS + base_atoms
+                    ]
+                )
+                ids.append((chain.id, residue.id[1], residue.id[2], residue.resname))
+                same_chain_prev.append(i > 0)
+
+    index = np.array(
+        ids,
+        dtype=[("chain", "U4"), ("number", "i4"), ("icode", "U1"), ("name", "U3")],
+    )
+    atom_indices = np.array(rows, dtype=int).reshape(-1, len(GATHERED_ATOMS) + 2)
+    return index, atom_indices, np.array(same_chain_prev, dtype=bool)
+
+
+def take_atom_coords(coords, atom_indices):
+    """Take coordinates of atoms at given positions, NaN where position is -1."""
+    coords = np.append(np.asarray(coords, dtype=np.float64), np.full((1, 3), np.nan), 0)
+    return coords[atom_indices]
+
+
+def gather_atom_coords(structure):
+    """Gather coordinates of atoms needed for torsion angles of all residues.
+
+    Returns:
+        Tuple of (index, coords, same_chain_prev) where index is a structured
+        array with chain, number, icode and name of residues, coords is an array
+        of shape (n_residues, len(GATHERED_ATOMS) + 2, 3) with NaN for missing
+        atoms (the last two are base atoms for chi) and same_chain_prev tells if
+        the previous residue belongs to the same chain
+    """
+    index, atom_indices, same_chain_prev = gather_atom_indices(structure)
+    coords = np.array([atom.coord for atom in structure.get_atoms()]).reshape(-1, 3)
+    return index, take_atom_coords(coords, atom_indices), same_chain_prev
+
+
+def calculate_torsion_table(structure):
+    """Calculate torsion angles, pseudotorsions and sugar pucker as an array.
+
+    Returns:
+        Tuple of (index, angles) where index is a structured array with chain,
+        number, icode and name of residues and angles is an array of shape
+        (n_residues, len(TABLE_ANGLES)) in degrees with NaN for missing values
+    """
+    return torsion_table_from_coords(*gather_atom_coords(structure))
+
+
+def torsion_table_from_coords(index, coords, same_chain_prev):
+    """Calculate the torsion table from coordinates gathered by gather_atom_coords."""
+    atom = {name: coords[:, k] for k, name in enumerate(GATHERED_ATOMS)}
+    base1, base2 = coords[:, -2], coords[:, -1]
+
+    # Atoms of previous and next residue in the same chain
+    def shift(values, offset):
+        shifted = np.full_like(values, np.nan)
+        if offset < 0:
+            shifted[1:] = values[:-1]
+            shifted[~same_chain_prev] = np.nan
+        else:
+            shifted[:-1] = values[1:]
+            shifted[:-1][~same_chain_prev[1:]] = np.nan
+        return shifted
+
+    O3_prev = shift(atom["O3'"], -1)
+    C4_prev = shift(atom["C4'"], -1)
+    P_next = shift(atom["P"], 1)
+    O5_next = shift(atom["O5'"], 1)
+    C4_next = shift(atom["C4'"], 1)
+
+    P, O5, C5, C4 = atom["P"], atom["O5'"], atom["C5'"], atom["C4'"]
+    C3, O3, C2, C1, O4 = atom["C3'"], atom["O3'"], atom["C2'"], atom["C1'"], atom["O4'"]
+
+    torsion = calculate_torsion_angle_array
+    nu0 = torsion(C4, O4, C1, C2)
+    nu1 = torsion(O4, C1, C2, C3)
+    nu2 = torsion(C1, C2, C3, C4)
+    nu3 = torsion(C2, C3, C4, O4)
+    nu4 = torsion(C3, C4, O4, C1)
+
+    # Altona-Sundaralingam pseudorotation phase and amplitude
+    phase = np.arctan2(
+        (nu4 + nu1) - (nu3 + nu0),
+        2 * nu2 * (np.sin(np.radians(36)) + np.sin(np.radians(72))),
+    )
+    amplitude = nu2 / np.cos(phase)
+
+    angles = np.stack(
+        [
+            torsion(O3_prev, P, O5, C5),
+            torsion(P, O5, C5, C4),
+            torsion(O5, C5, C4, C3),
+            torsion(C5, C4, C3, O3),
+            torsion(C4, C3, O3, P_next),
+            torsion(C3, O3, P_next, O5_next),
+            torsion(O4, C1, base1, base2),
+            torsion(C4_prev, P, C4, P_next),
+            torsion(P, C4, P_next, C4_next),
+            np.degrees(phase) % 360,
+            amplitude,
+        ],
+        axis=-1,
+    )
+    return index, angles.reshape(-1, len(TABLE_ANGLES))
+
+
+def export_torsion_table(structure, output_path):
+    """Write the torsion table as a structured .npy array.
+
+    Each record holds the residue index fields (chain, number, icode, name)
+    followed by one float64 field per angle in TABLE_ANGLES. Residues without
+    any gathered backbone or base atom (e.g. water or ions) are skipped. The
+    file can be memory-mapped with ``np.load(output_path, mmap_mode="r")``.
+    """
+    index, coords, same_chain_prev = gather_atom_coords(structure)
+    index, angles = torsion_table_from_coords(index, coords, same_chain_prev)
+
+    # Angles are calculated first, as they need neighbors of kept residues
+    present = ~np.isnan(coords).all(axis=(1, 2))
+    index, angles = index[present], angles[present]
+
+    table = np.empty(
+        len(index),
+        dtype=index.dtype.descr + [(name, "f8") for name in TABLE_ANGLES],
+    )
+    for field in index.dtype.names:
+        table[field] = index[field]
+    for k, name in enumerate(TABLE_ANGLES):
+        table[name] = angles[:, k]
+
+    np.save(output_path, table)
+
+
+def export(pdb_file, output_path):
+    """Export torsion angles of a structure to a binary .npy file."""
+    parser = PDB.PDBParser(QUIET=True)
+    structure = parser.get_structure("struct", pdb_file)
+    export_torsion_table(structure, output_path)
+
+
 def main(pdb_file1, pdb_file2):
     """Calculate and compare torsion angles for two structures."""
     parser = PDB.PDBParser(QUIET=True)
@@ -138,7 +351,11 @@ def main(pdb_file1, pdb_file2):
 if __name__ == "__main__":
     import sys
 
-    if len(sys.argv) != 3:
+    if len(sys.argv) == 4 and sys.argv[1] == "export":
+        export(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) == 3:
+        main(sys.argv[1], sys.argv[2])
+    else:
         print("Usage: python torsion.py <pdb_file1> <pdb_file2>")
+        print("       python torsion.py export <pdb_file> <output.npy>")
         sys.exit(1)
-    main(sys.argv[1], sys.argv[2])
@@ -0,0 +1,148 @@
+#! /usr/bin/env python
+import argparse
+
+import numpy as np
+from Bio import PDB
+
+from mcq import MCQ_COLUMNS, align_torsion_table, calculate_window_mcq
+from rmsd import calculate_window_rmsd
+from torsion import GATHERED_ATOMS, gather_atom_coords, torsion_table_from_coords
+
+
+def load_residue_features(structure):
+    """
+    Gather phosphorus coordinates and MCQ torsion angles of residues in one pass.
+
+    :param structure: PDB structure
+    :return: Tuple of (index, phosphorus coords, angles), residues without any
+        of these (e.g. water or ions) are skipped
+    """
+    index, coords, same_chain_prev = gather_atom_coords(structure)
+    _, angles = torsion_table_from_coords(index, coords, same_chain_prev)
+    phosphorus = coords[:, GATHERED_ATOMS.index("P")]
+    angles = angles[:, MCQ_COLUMNS]
+
+    nucleotide = ~np.isnan(phosphorus).any(axis=1) | ~np.isnan(angles).all(axis=1)
+    return index[nucleotide], phosphorus[nucleotide], angles[nucleotide]
+
+
+def window_bounds(chains, width, stride, per_chain=False):
+    """
+    Find windows of consecutive residues which do not cross chain boundaries.
+
+    :param chains: Array with chain identifier of each residue
+    :param width: Number of residues in a window
+    :param stride: Distance between starts of consecutive windows
+    :param per_chain: If True, return a single window per chain
+    :return: Tuple of (starts, ends) arrays, a window covers [start, end) and
+        the last window of each chain always ends at the end of the chain
+    """
+    if width < 1 or stride < 1:
+        raise ValueError("Window width and stride must be positive")
+
+    starts, ends = [], []
+    if len(chains) == 0:
+        return np.array(starts, dtype=int), np.array(ends, dtype=int)
+
+    boundaries = (np.flatnonzero(chains[1:] != chains[:-1]) + 1).tolist()
+
+    for chain_start, chain_end in zip([0, *boundaries], [*boundaries, len(chains)]):
+        if per_chain:
+            starts.append(chain_start)
+            ends.append(chain_end)
+            continue
+
+        # Chains shorter than the window width give a single window
+        last_start = chain_start + max(chain_end - chain_start - width, 0)
+        chain_starts = list(range(chain_start, last_start + 1, stride))
+
+        # The stride may skip the end of a chain, which gets a window of its own
+        if chain_starts[-1] != last_start:
+            chain_starts.append(last_start)
+
+        for start in chain_starts:
+            starts.append(start)
+            ends.append(min(start + width, chain_end))
+
+    return np.array(starts, dtype=int), np.array(ends, dtype=int)
+
+
+def calculate_windows(structure1, structure2, width=20, stride=1, per_chain=False):
+    """
+    Calculate RMSD and MCQ in sliding windows or per chain.
+
+    Windows are defined on residues of the first structure, residues of the
+    second structure are matched by chain, number and insertion code.
+
+    :return: List of (chain, first residue, last residue, rmsd, mcq) tuples,
+        empty if the first structure has no nucleotides
+    """
+    index1, phosphorus1, angles1 = load_residue_features(structure1)
+    if len(index1) == 0:
+        return []
+
+    index2, phosphorus2, angles2 = load_residue_features(structure2)
+    phosphorus2 = align_torsion_table(index1, index2, phosphorus2)
+    angles2 = align_torsion_table(index1, index2, angles2)
+
+    starts, ends = window_bounds(index1["chain"], width, stride, per_chain)
+    rmsd = calculate_window_rmsd(phosphorus1, phosphorus2, starts, ends)
+    mcq = calculate_window_mcq(angles1, angles2, starts, ends)
+
+    return [
+        (
+            str(index1["chain"][start]),
+            int(index1["number"][start]),
+            int(index1["number"][end - 1]),
+            float(rmsd[k]),
+            float(mcq[k]),
+        )
+        for k, (start, end) in enumerate(zip(starts, ends))
+    ]
+
+
+def positive_int(value):
+    """Parse a command line argument which must be an integer of at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def main(pdb_file1, pdb_file2, width=20, stride=1, per_chain=False):
+    parser = PDB.PDBParser(QUIET=True)
+
+    # Load structures
+    structure1 = parser.get_structure("struct1", pdb_file1)
+    structure2 = parser.get_structure("struct2", pdb_file2)
+
+    print("chain\tstart\tend\trmsd\tmcq")
+    for chain, start, end, rmsd, mcq in calculate_windows(
+        structure1, structure2, width, stride, per_chain
+    ):
+        print(f"{chain}\t{start}\t{end}\t{rmsd:.4f}\t{mcq:.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Calculate RMSD and MCQ in sliding windows or per chain."
+    )
+    parser.add_argument("pdb_file1", help="Reference PDB file")
+    parser.add_argument("pdb_file2", help="Model PDB file")
+    parser.add_argument(
+        "--width",
+        type=positive_int,
+        default=20,
+        help="Window width in residues (default: 20)",
+    )
+    parser.add_argument(
+        "--stride",
+        type=positive_int,
+        default=1,
+        help="Distance between windows (default: 1)",
+    )
+    parser.add_argument(
+        "--per-chain", action="store_true", help="Use a single window per chain"
+    )
+    args = parser.parse_args()
+    main(args.pdb_file1, args.pdb_file2, args.width, args.stride, args.per_chain)